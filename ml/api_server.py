@@ -2,22 +2,45 @@
 FastAPI server for emotion classification model
 """
 
-from fastapi import FastAPI, HTTPException
+import time
+PROCESS_START = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
-from typing import List, Dict, Optional
-from inference import EmotionClassifier
+from typing import List, Dict, Optional, Tuple
+from micro_batcher import MicroBatcher
+from inference_executor import InferenceExecutor, InferenceOverloadedError
+from prediction_cache import PredictionCache, normalize_text
 import os
+import json
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Import our new services
 try:
-    from services.suggestions import get_emotion_suggestions
+    from services.suggestions import get_emotion_suggestions, normalize_emotion
     from services.sentiment_enhanced import analyze_sentiment_comprehensive
     from services.interventions import get_micro_intervention
     from services.affirmations import get_affirmation
     from services.routines import get_recommended_routine
     from services.music import get_music_suggestion
-    from services.safety import check_for_safety, get_safe_response_override
+    from services.safety import check_for_safety, get_safe_response_override, StreamingSafetyScanner
+    from services.mood_store import get_mood_store
+    from services.mood_analytics import MAX_DAYS, mood_analytics, encode_timeline, timestamp_in_range
+    from services.pipeline import (
+        render_emotion_response,
+        render_emotion_response_batch,
+        warm_up_services,
+        select_fields,
+        text_stages_needed,
+        TextStages,
+        STAGE_BUDGETS,
+        OPTIONAL_STAGE_TIMEOUTS
+    )
+    from cascade import LexiconFastPath
     SERVICES_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Could not import services: {e}")
@@ -25,13 +48,26 @@ except ImportError as e:
     SERVICES_AVAILABLE = False
     # Create dummy functions to prevent errors
     def get_emotion_suggestions(*args, **kwargs): return {}
+    def normalize_emotion(emotion, *args, **kwargs): return emotion.lower()
     def analyze_sentiment_comprehensive(*args, **kwargs): return {}
+    def warm_up_services(*args, **kwargs): return None
     def get_micro_intervention(*args, **kwargs): return {}
     def get_affirmation(*args, **kwargs): return "You are valued and supported."
     def get_recommended_routine(*args, **kwargs): return {}
     def get_music_suggestion(*args, **kwargs): return {}
     def check_for_safety(*args, **kwargs): return {'is_risk': False, 'risk_level': 'low'}
     def get_safe_response_override(*args, **kwargs): return None
+    render_emotion_response = None
+    render_emotion_response_batch = None
+    select_fields = None
+    text_stages_needed = None
+    TextStages = None
+    STAGE_BUDGETS = OPTIONAL_STAGE_TIMEOUTS = {}
+    StreamingSafetyScanner = None
+    get_mood_store = None
+    mood_analytics = encode_timeline = timestamp_in_range = None
+    MAX_DAYS = 0
+    LexiconFastPath = None
 
 app = FastAPI(title="Emotion Classification API")
 
@@ -50,25 +86,193 @@ app.add_middleware(
 # Initialize classifier
 # Use absolute path based on script location
 script_dir = os.path.dirname(os.path.abspath(__file__))
-model_path = os.path.join(script_dir, "checkpoints", "best_model")
+# Model directory: fp32 checkpoint by default, or e.g. checkpoints/best_model_int8
+model_path = os.path.join(script_dir, os.environ.get("EMOTION_MODEL_DIR", os.path.join("checkpoints", "best_model")))
+# Inference backend: "torch" (default) or "onnx" (requires convert_to_onnx.py export)
+model_backend = os.environ.get("EMOTION_BACKEND", "torch")
+# Optional early-exit confidence threshold (requires train_model.py --early-exit-heads)
+early_exit_threshold = float(os.environ["EMOTION_EARLY_EXIT_THRESHOLD"]) if os.environ.get("EMOTION_EARLY_EXIT_THRESHOLD") else None
+# Texts over 128 tokens: "mean" | "max" | "length" over sliding windows, or "none" to truncate
+long_text_aggregation = os.environ.get("EMOTION_LONG_TEXT_AGGREGATION", "mean").lower()
+if long_text_aggregation == "none":
+    long_text_aggregation = None
+# Bounds on the work one long text can cause: windows scored per text (evenly
+# spaced past the limit) and characters accepted at all (413 beyond)
+max_windows = int(os.environ.get("EMOTION_MAX_WINDOWS", "32"))
+MAX_TEXT_CHARS = int(os.environ.get("EMOTION_MAX_TEXT_CHARS", "100000"))
 classifier = None
 
-try:
-    print(f"Attempting to load model from: {model_path}")
-    classifier = EmotionClassifier(model_path)
-    print("Model loaded successfully!")
+# Micro-batching: concurrent /predict and /predict/simple calls share one forward pass
+BATCH_MAX_SIZE = int(os.environ.get("EMOTION_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("EMOTION_BATCH_MAX_WAIT_MS", "5"))
+batcher = None
+
+# Inference runs on its own pool so a slow forward pass never blocks the event
+# loop (/health keeps answering). Requests beyond EMOTION_MAX_PENDING queued or
+# running get an immediate 503 with Retry-After.
+inference_executor = InferenceExecutor(
+    max_workers=int(os.environ.get("EMOTION_INFERENCE_THREADS", "1")),
+    max_pending=int(os.environ.get("EMOTION_MAX_PENDING", "64")),
+    timeout_seconds=float(os.environ.get("EMOTION_REQUEST_TIMEOUT_SECONDS", "10")),
+    retry_after_seconds=float(os.environ.get("EMOTION_RETRY_AFTER_SECONDS", "1"))
+)
+
+@app.exception_handler(InferenceOverloadedError)
+async def inference_overloaded(request: Request, error: InferenceOverloadedError):
+    """Shed load with 503 + Retry-After instead of queueing without bound"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Server busy: {error}"},
+        headers={"Retry-After": str(max(1, round(error.retry_after)))}
+    )
+
+# /emotion-response stages (safety, sentiment, suggestions, ...) run concurrently
+# on their own pool; optional stages (EMOTION_OPTIONAL_STAGES, default TextBlob)
+# that exceed their budget are skipped
+services_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("EMOTION_SERVICE_THREADS", "8")),
+    thread_name_prefix="services"
+)
+# Upper bound on items per /emotion-response/batch request
+MAX_BATCH_ITEMS = int(os.environ.get("EMOTION_MAX_BATCH_ITEMS", "256"))
+STAGE_TIMEOUTS = dict(OPTIONAL_STAGE_TIMEOUTS)
+if "EMOTION_OPTIONAL_STAGES" in os.environ:
+    STAGE_TIMEOUTS = {
+        stage: STAGE_BUDGETS[stage]
+        for stage in os.environ["EMOTION_OPTIONAL_STAGES"].replace(" ", "").split(",")
+        if stage in STAGE_BUDGETS
+    }
+if os.environ.get("EMOTION_STAGE_TIMEOUT_MS"):
+    STAGE_TIMEOUTS = {
+        stage: float(os.environ["EMOTION_STAGE_TIMEOUT_MS"]) / 1000.0 for stage in STAGE_TIMEOUTS
+    }
+
+# Readiness is tracked separately from liveness: the server binds its port
+# immediately and the model is loaded and warmed up in the background
+model_status = {"state": "not_started", "error": None, "phases": {}}
+# Shared sentiment analyzers and response table, built on the service pool at startup
+services_status = {"state": "not_started", "error": None}
+
+def load_model(warmup: bool = True):
+    """
+    Load the classifier, warm it up and publish it for request handlers
     
-    # Test the model with a sample input to verify it's working
+    Runs in a background thread at startup. Requests keep getting mock
+    responses until the classifier is published, which only happens after
+    warm-up so the first real requests don't hit cold shapes.
+    """
+    global classifier, batcher
+    phases = model_status["phases"]
     try:
-        test_result = classifier.predict("I am happy", top_k=1)
-        print(f"Model test prediction: {test_result}")
-    except Exception as test_error:
-        print(f"Warning: Model loaded but test prediction failed: {test_error}")
-except Exception as e:
-    print(f"ERROR: Could not load model: {e}")
-    import traceback
-    traceback.print_exc()
-    print("API will return mock responses until model is trained.")
+        model_status["state"] = "loading"
+        phase_start = time.perf_counter()
+        # Heavy imports (torch, transformers) happen here, after the port is bound
+        from inference import EmotionClassifier, SAFETENSORS_FILENAME
+        phases["import_seconds"] = time.perf_counter() - phase_start
+        
+        if model_backend == "torch" and not os.path.exists(os.path.join(model_path, SAFETENSORS_FILENAME)):
+            print(f"Note: no {SAFETENSORS_FILENAME} in {model_path}; run convert_to_safetensors.py for faster, shared loading")
+        
+        phase_start = time.perf_counter()
+        print(f"Attempting to load model from: {model_path} (backend: {model_backend})")
+        loaded = EmotionClassifier(
+            model_path,
+            backend=model_backend,
+            early_exit_threshold=early_exit_threshold,
+            long_text_aggregation=long_text_aggregation,
+            max_windows=max_windows
+        )
+        phases["load_seconds"] = time.perf_counter() - phase_start
+        print("Model loaded successfully!")
+        
+        if warmup:
+            model_status["state"] = "warming_up"
+            phases["warmup_seconds"] = loaded.warmup()
+        
+        batcher = MicroBatcher(
+            # Texts in a running batch count as running, not queued, in /metrics
+            inference_executor.tracked(loaded.predict_proba),
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            executor=inference_executor.pool
+        )
+        classifier = loaded
+        model_status["state"] = "ready"
+        phases["ready_after_seconds"] = time.perf_counter() - PROCESS_START
+        
+        print("Startup phases: " + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in phases.items()))
+    except Exception as e:
+        model_status["state"] = "failed"
+        model_status["error"] = str(e)
+        print(f"ERROR: Could not load model: {e}")
+        import traceback
+        traceback.print_exc()
+        print("API will return mock responses until model is trained.")
+
+# Prediction cache shared by /predict and /predict/simple (EMOTION_CACHE_SIZE=0 disables it)
+CACHE_MAX_SIZE = int(os.environ.get("EMOTION_CACHE_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.environ.get("EMOTION_CACHE_TTL_SECONDS", "0")) or None
+prediction_cache = PredictionCache(max_size=CACHE_MAX_SIZE, ttl_seconds=CACHE_TTL_SECONDS)
+
+# Cascade mode: a lexicon fast path answers clear-cut texts before the model (EMOTION_CASCADE=1)
+CASCADE_ENABLED = os.environ.get("EMOTION_CASCADE", "0").lower() in ("1", "true", "yes")
+CASCADE_MIN_CONFIDENCE = float(os.environ.get("EMOTION_CASCADE_MIN_CONFIDENCE", "0.8"))
+fast_path = None
+if CASCADE_ENABLED and LexiconFastPath is not None:
+    fast_path = LexiconFastPath(min_confidence=CASCADE_MIN_CONFIDENCE)
+stage_counts = {"lexicon": 0, "model": 0}
+
+def finish_services_warm_up(future):
+    error = future.exception()
+    if error is not None:
+        print(f"ERROR: Service warm-up failed: {error}")
+        services_status.update(state="failed", error=str(error))
+    else:
+        services_status["state"] = "ready"
+
+@app.on_event("startup")
+async def start_model_loading():
+    model_status["phases"]["server_start_seconds"] = time.perf_counter() - PROCESS_START
+    if classifier is None and model_status["state"] == "not_started":
+        threading.Thread(target=load_model, name="model-loader", daemon=True).start()
+    # Build the shared sentiment analyzers and response table before the first request needs them
+    services_status["state"] = "warming_up"
+    services_executor.submit(warm_up_services).add_done_callback(finish_services_warm_up)
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    if batcher:
+        await batcher.stop()
+    inference_executor.shutdown()
+    services_executor.shutdown(wait=False)
+
+async def score_text(text: str, top_k: int) -> Tuple[List[Dict[str, float]], str]:
+    """
+    Score a single text, answering from the cheapest stage that can
+    
+    In cascade mode the lexicon fast path answers single-label requests
+    (top_k == 1) first, with a GoEmotions label like the model's; requests
+    for more labels always go to the model, which ranks them all. Otherwise the
+    normalized text is looked up in the prediction cache; misses score the
+    text as sent (like EmotionClassifier.predict) through the micro-batcher,
+    and variants sharing the cache key then share that prediction.
+    
+    Returns:
+        Tuple of (predictions, stage) where stage is 'lexicon' or 'model'
+    """
+    if fast_path is not None and top_k == 1:
+        fast = fast_path.classify(text)
+        if fast is not None:
+            stage_counts["lexicon"] += 1
+            return [{"emotion": fast["emotion"], "confidence": fast["confidence"]}], "lexicon"
+    
+    normalized = normalize_text(text)
+    probs = prediction_cache.get(normalized, classifier.model_version)
+    if probs is None:
+        probs = await inference_executor.guard(batcher.submit(text))
+        prediction_cache.put(normalized, classifier.model_version, probs)
+    stage_counts["model"] += 1
+    return classifier.top_predictions(probs, top_k), "model"
 
 class TextInput(BaseModel):
     text: str
@@ -82,12 +286,43 @@ class PredictionResponse(BaseModel):
     predictions: List[EmotionPrediction]
     top_emotion: str
     top_confidence: float
+    stage: Optional[str] = None  # 'lexicon' or 'model' (which cascade stage answered)
 
 class EmotionResponseRequest(BaseModel):
     emotion: str
     text_input: Optional[str] = None
     intensity: Optional[float] = None
     mood_history: Optional[List[Dict]] = None
+    user_id: Optional[str] = None  # use this user's stored mood aggregates instead of mood_history
+    fields: Optional[List[str]] = None  # EmotionResponse fields to compute (default all)
+
+class EmotionResponseBatchRequest(BaseModel):
+    items: List[EmotionResponseRequest]
+
+class AnalyzeRequest(BaseModel):
+    text: str
+    top_k: int = 3
+    intensity: Optional[float] = None  # defaults to the top prediction's confidence
+    mood_history: Optional[List[Dict]] = None  # previous entries, excluding this message
+    user_id: Optional[str] = None  # record this message in the user's stored mood history
+    fields: Optional[List[str]] = None  # emotion_response fields to compute (default all)
+
+class MoodEntryRequest(BaseModel):
+    user_id: str
+    emotion: str
+    timestamp: Optional[float] = None  # Unix seconds, defaults to now
+    confidence: Optional[float] = None
+
+class MoodAnalyticsEntry(BaseModel):
+    emotion: str
+    timestamp: float  # Unix seconds
+
+class MoodAnalyticsRequest(BaseModel):
+    user_id: Optional[str] = None  # analyze the stored history of this user...
+    entries: Optional[List[MoodAnalyticsEntry]] = None  # ...or these entries
+    since: Optional[float] = None  # only stored entries from this time on
+    window: int = 7  # rolling window in days
+    tz_offset_minutes: int = 0  # client's UTC offset, for local days and weekdays
 
 class EmotionResponse(BaseModel):
     supportive_message: str
@@ -99,6 +334,13 @@ class EmotionResponse(BaseModel):
     music: Dict
     safe_override_if_any: Optional[Dict] = None
     sentiment_analysis: Optional[Dict] = None
+    skipped_stages: List[str] = []  # stages dropped for time or failure (e.g. 'textblob')
+
+class EmotionResponseBatch(BaseModel):
+    responses: List[EmotionResponse]  # one per request item, in order
+
+class AnalyzeResponse(PredictionResponse):
+    emotion_response: Optional[EmotionResponse] = None  # None if support services are unavailable
 
 @app.get("/")
 async def root():
@@ -110,7 +352,63 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "model_loaded": classifier is not None}
+    return {
+        "status": "healthy",
+        "model_loaded": classifier is not None,
+        "ready": model_status["state"] == "ready",
+        "model_state": model_status["state"],
+        "model_error": model_status["error"],
+        "services_state": services_status["state"],
+        "services_error": services_status["error"],
+        "startup_phases": model_status["phases"]
+    }
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: 503 until the model is loaded and warmed up and the services are warmed up"""
+    if model_status["state"] != "ready":
+        raise HTTPException(status_code=503, detail=f"Model not ready ({model_status['state']})")
+    if services_status["state"] != "ready":
+        raise HTTPException(status_code=503, detail=f"Services not ready ({services_status['state']})")
+    return {"status": "ready"}
+
+def process_memory() -> Optional[Dict[str, float]]:
+    """
+    Memory of this worker process in MB (Linux only)
+    
+    `private_mb` is what this process alone holds; weight pages shared with
+    other pre-forked workers (serve_multiworker.py) are counted in `shared_mb`.
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024.0
+    except OSError:
+        return None
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+        "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0)
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Serving counters for the text model"""
+    return {
+        "pid": os.getpid(),
+        "memory": process_memory(),
+        "model_loaded": classifier is not None,
+        "model_version": classifier.model_version if classifier else None,
+        "prediction_cache": prediction_cache.stats(),
+        "batcher": batcher.stats() if batcher else None,
+        "inference_executor": inference_executor.stats(),
+        "stages": dict(stage_counts),
+        "early_exit": classifier.exit_stats() if classifier and classifier.early_exit_heads is not None else None
+    }
 
 @app.options("/health")
 async def health_options():
@@ -122,6 +420,7 @@ async def predict_emotion(input: TextInput):
     """
     Predict emotions from text input
     """
+    check_text_length(input.text)
     if not classifier:
         print("WARNING: Classifier not loaded, returning neutral response")
         # Return mock response if model not loaded
@@ -135,7 +434,7 @@ async def predict_emotion(input: TextInput):
     
     try:
         print(f"Predicting emotion for text: '{input.text}'")
-        predictions = classifier.predict(input.text, top_k=input.top_k)
+        predictions, stage = await score_text(input.text, input.top_k)
         print(f"Predictions: {predictions}")
         
         if not predictions or len(predictions) == 0:
@@ -147,8 +446,11 @@ async def predict_emotion(input: TextInput):
                 for p in predictions
             ],
             top_emotion=predictions[0]["emotion"],
-            top_confidence=predictions[0]["confidence"]
+            top_confidence=predictions[0]["confidence"],
+            stage=stage
         )
+    except InferenceOverloadedError:
+        raise
     except Exception as e:
         print(f"ERROR in predict_emotion: {str(e)}")
         import traceback
@@ -160,6 +462,7 @@ async def predict_simple(input: TextInput):
     """
     Simple prediction endpoint returning just the top emotion
     """
+    check_text_length(input.text)
     if not classifier:
         print("WARNING: Classifier not loaded, returning neutral response")
         return {
@@ -169,18 +472,47 @@ async def predict_simple(input: TextInput):
     
     try:
         print(f"Predicting emotion (simple) for text: '{input.text}'")
-        emotion, confidence = classifier.predict_single(input.text)
-        print(f"Result: {emotion} ({confidence:.4f})")
+        predictions, stage = await score_text(input.text, 1)
+        emotion, confidence = predictions[0]["emotion"], predictions[0]["confidence"]
+        print(f"Result: {emotion} ({confidence:.4f}, stage: {stage})")
         return {
             "emotion": emotion,
-            "confidence": confidence
+            "confidence": confidence,
+            "stage": stage
         }
+    except InferenceOverloadedError:
+        raise
     except Exception as e:
         print(f"ERROR in predict_simple: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+async def run_on_services(fn, *args):
+    """Run blocking service work (e.g. mood store queries) on services_executor"""
+    return await asyncio.get_running_loop().run_in_executor(services_executor, fn, *args)
+
+def require_services():
+    if not SERVICES_AVAILABLE:
+        raise HTTPException(
+            status_code=503, 
+            detail="Emotional support services are not available. Please check server configuration."
+        )
+
+def check_text_length(text: str):
+    """Reject texts over MAX_TEXT_CHARS with a 413"""
+    if len(text) > MAX_TEXT_CHARS:
+        raise HTTPException(
+            status_code=413, detail=f"Text too long ({len(text)} > {MAX_TEXT_CHARS} characters)"
+        )
+
+def check_fields(fields: Optional[List[str]]):
+    """Reject unknown response field names with a 422"""
+    try:
+        select_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
 @app.post("/emotion-response", response_model=EmotionResponse)
 async def get_emotion_response(request: EmotionResponseRequest):
     """
@@ -191,82 +523,304 @@ async def get_emotion_response(request: EmotionResponseRequest):
         - text_input: Optional user text for sentiment analysis
         - intensity: Optional emotion intensity (0.0-1.0)
         - mood_history: Optional list of previous mood entries
+        - user_id: Optional user whose stored mood aggregates (see /mood)
+          replace mood_history, so the client needn't upload its history
+        - fields: Optional list of response fields to return; parts that
+          aren't requested are not computed (e.g. ["affirmation"] runs no
+          sentiment analysis)
     
     Output:
         Complete JSON with supportive_message, actions, tools, intervention,
-        routine, affirmation, music, and safety override if needed
+        routine, affirmation, music, and safety override if needed, plus
+        skipped_stages listing stages dropped for time or failure (or only
+        the requested fields)
+    
+    Independent stages run concurrently and catalog content is precompiled
+    per emotion (see services/pipeline.py and services/response_table.py).
     """
     if not SERVICES_AVAILABLE:
         raise HTTPException(
             status_code=503, 
             detail="Emotional support services are not available. Please check server configuration."
         )
+    check_fields(request.fields)
     
     try:
-        emotion = request.emotion
-        text_input = request.text_input
-        intensity = request.intensity
-        mood_history = request.mood_history
-        
-        # Safety check first (if text provided)
-        safety_check = None
-        safe_override = None
-        if text_input:
-            safety_check = check_for_safety(text_input)
-            safe_override = get_safe_response_override(emotion, safety_check)
-        
-        # Enhanced sentiment analysis (if text provided)
-        sentiment_analysis = None
-        if text_input:
-            try:
-                sentiment_analysis = analyze_sentiment_comprehensive(text_input)
-                # Use sentiment intensity if intensity not provided
-                if intensity is None:
-                    intensity = sentiment_analysis.get('intensity', 0.5)
-            except Exception as e:
-                print(f"Warning: Sentiment analysis failed: {e}")
+        mood_summary = None
+        if request.user_id and not request.mood_history:
+            mood_summary = await run_on_services(get_mood_store().summary, request.user_id)
         
-        # Get emotion-based suggestions
-        suggestions = get_emotion_suggestions(
-            emotion=emotion,
-            text=text_input,
-            intensity=intensity,
-            mood_history=mood_history
+        # Catalog parts come pre-serialized from the response table; the body
+        # is assembled as JSON directly instead of going through the model
+        body = await render_emotion_response(
+            request.emotion,
+            text_input=request.text_input,
+            intensity=request.intensity,
+            mood_history=request.mood_history,
+            mood_summary=mood_summary,
+            executor=services_executor,
+            stage_timeouts=STAGE_TIMEOUTS,
+            fields=request.fields
         )
+        return Response(content=body, media_type="application/json")
+    
+    except Exception as e:
+        print(f"ERROR in get_emotion_response: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
+
+@app.post("/emotion-response/batch", response_model=EmotionResponseBatch)
+async def get_emotion_response_batch(request: EmotionResponseBatchRequest):
+    """
+    /emotion-response for many entries in one call (e.g. mood history views)
+    
+    Identical requests are computed once, and safety and sentiment for all
+    distinct texts run through their batch APIs. Responses come back in the
+    order of the request items.
+    """
+    if not SERVICES_AVAILABLE:
+        raise HTTPException(
+            status_code=503, 
+            detail="Emotional support services are not available. Please check server configuration."
+        )
+    if len(request.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many items ({len(request.items)}); the limit is {MAX_BATCH_ITEMS}"
+        )
+    for item in request.items:
+        check_fields(item.fields)
+    
+    try:
+        items = [item.model_dump() for item in request.items]
+        # One store read per distinct user
+        user_ids = list(dict.fromkeys(item["user_id"] for item in items if item["user_id"] and not item["mood_history"]))
+        if user_ids:
+            store = get_mood_store()
+            summaries = dict(zip(user_ids, await run_on_services(lambda: [store.summary(u) for u in user_ids])))
+            for item in items:
+                if item["user_id"] in summaries and not item["mood_history"]:
+                    item["mood_summary"] = summaries[item["user_id"]]
         
-        # Get micro-intervention
-        intervention_type = suggestions.get('micro_intervention', 'breathing_reset')
-        intervention = get_micro_intervention(emotion, intervention_type)
-        
-        # Get affirmation
-        affirmation = get_affirmation(emotion)
-        
-        # Get recommended routine
-        routine = get_recommended_routine(emotion, mood_history)
-        
-        # Get music suggestion
-        music = get_music_suggestion(emotion)
+        bodies = await render_emotion_response_batch(items, executor=services_executor)
+        return Response(content=b'{"responses":[' + b",".join(bodies) + b"]}", media_type="application/json")
+    
+    except Exception as e:
+        print(f"ERROR in get_emotion_response_batch: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error generating responses: {str(e)}")
+
+@app.post("/analyze", response_model=AnalyzeResponse)
+async def analyze(request: AnalyzeRequest):
+    """
+    Classify text and build the emotional support response in one call
+    
+    Equivalent to /predict followed by /emotion-response for the top emotion,
+    without the second round trip. Safety, VADER, TextBlob and tone detection
+    only need the text, so they start before classification and run while the
+    model scores it; only the emotion-dependent parts wait for the prediction.
+    
+    Input:
+        - text: User text
+        - top_k: Number of predictions to return
+        - intensity: Optional emotion intensity (defaults to top_confidence)
+        - mood_history: Optional list of previous mood entries; this message
+          is appended as the latest entry
+        - user_id: Optional user; the message is recorded in the mood store
+          and the user's updated aggregates are used instead of mood_history
+          (nothing is recorded while the model is not loaded)
+        - fields: Optional list of emotion_response fields to compute
+    
+    Output:
+        The /predict fields plus emotion_response (the /emotion-response
+        payload, or null if support services are unavailable)
+    """
+    check_text_length(request.text)
+    # Text-only stages run on services_executor while the model scores the text
+    stages = None
+    if SERVICES_AVAILABLE:
+        check_fields(request.fields)
+        # Intensity is always known here (top_confidence at the latest), so tools never need VADER
+        needed = text_stages_needed(select_fields(request.fields), intensity=1.0)
+        stages = TextStages(request.text, services_executor, STAGE_TIMEOUTS, stages=needed)
+    
+    try:
+        if classifier:
+            predictions, stage = await score_text(request.text, request.top_k)
+            if not predictions:
+                raise ValueError("No predictions returned from model")
+        else:
+            print("WARNING: Classifier not loaded, returning neutral response")
+            predictions, stage = [{"emotion": "neutral", "confidence": 0.5}], None
         
-        # Build response
-        response = {
-            "supportive_message": suggestions.get('supportive_message', 'I\'m here to support you.'),
-            "actions": suggestions.get('suggested_actions', []),
-            "tools": suggestions.get('recommended_tools', []),
-            "intervention": intervention,
-            "routine": routine,
-            "affirmation": affirmation,
-            "music": music,
-            "safe_override_if_any": safe_override,
-            "sentiment_analysis": sentiment_analysis
-        }
+        top_emotion, top_confidence = predictions[0]["emotion"], predictions[0]["confidence"]
+        head = json.dumps({
+            "predictions": [{"emotion": p["emotion"], "confidence": p["confidence"]} for p in predictions],
+            "top_emotion": top_emotion,
+            "top_confidence": top_confidence,
+            "stage": stage
+        }, ensure_ascii=False, separators=(",", ":"))
         
-        return EmotionResponse(**response)
+        emotion_response = b"null"
+        if stages is not None:
+            mood_history = mood_summary = None
+            if request.user_id and stage is None:
+                # Fallback prediction (model not loaded): read the aggregates, record nothing
+                mood_summary = await run_on_services(get_mood_store().summary, request.user_id)
+            elif request.user_id:
+                mood_summary = await run_on_services(
+                    get_mood_store().add_entry, request.user_id, top_emotion, None, top_confidence
+                )
+            elif request.mood_history is not None:
+                mood_history = request.mood_history + [{"emotion": normalize_emotion(top_emotion)}]
+            emotion_response = await render_emotion_response(
+                top_emotion,
+                intensity=request.intensity if request.intensity is not None else top_confidence,
+                mood_history=mood_history,
+                mood_summary=mood_summary,
+                text_stages=stages,
+                fields=request.fields
+            )
         
+        body = head[:-1].encode("utf-8") + b',"emotion_response":' + emotion_response + b"}"
+        return Response(content=body, media_type="application/json")
+    except InferenceOverloadedError:
+        raise
     except Exception as e:
-        print(f"ERROR in get_emotion_response: {str(e)}")
+        print(f"ERROR in analyze: {str(e)}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+
+@app.post("/mood")
+async def add_mood_entry(entry: MoodEntryRequest):
+    """
+    Record a mood entry in the server-side mood store
+    
+    Returns the user's updated rolling aggregates (see GET /mood/{user_id}/summary).
+    """
+    require_services()
+    if entry.timestamp is not None and not timestamp_in_range(entry.timestamp):
+        raise HTTPException(status_code=422, detail="timestamp must be Unix seconds, not in the future")
+    try:
+        return await run_on_services(
+            get_mood_store().add_entry, entry.user_id, entry.emotion, entry.timestamp, entry.confidence
+        )
+    except ValueError as e:
+        # Out-of-order entry (older than the user's latest)
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.post("/mood/analytics")
+async def get_mood_analytics(request: MoodAnalyticsRequest):
+    """
+    Trends over a long mood history
+    
+    Rolling daily mean mood score, per-emotion frequencies, streaks,
+    day-of-week patterns and change points, computed with NumPy on the
+    normalized emotion categories (see services/mood_analytics.py). Analyzes
+    the stored history of `user_id`, or the `entries` sent with the request.
+    Entry times must be Unix seconds from 2000 on; only the last MAX_DAYS
+    days of a history are analyzed (excluded_entries counts the rest).
+    """
+    require_services()
+    if request.user_id is None and request.entries is None:
+        raise HTTPException(status_code=422, detail="Provide user_id or entries")
+    if not 1 <= request.window <= MAX_DAYS:
+        raise HTTPException(status_code=422, detail=f"window must be between 1 and {MAX_DAYS} days")
+    if abs(request.tz_offset_minutes) > 14 * 60:
+        raise HTTPException(status_code=422, detail="tz_offset_minutes must be within +/-840")
+    if request.entries is not None:
+        now = time.time()
+        for i, entry in enumerate(request.entries):
+            if not timestamp_in_range(entry.timestamp, now):
+                raise HTTPException(
+                    status_code=422, detail=f"entries[{i}].timestamp must be Unix seconds, not in the future"
+                )
+    
+    def analyze_history():
+        if request.entries is not None:
+            timestamps, codes = encode_timeline([(entry.timestamp, entry.emotion) for entry in request.entries])
+        else:
+            timestamps, codes = get_mood_store().timeline_arrays(request.user_id, request.since)
+        return mood_analytics(timestamps, codes, window=request.window, tz_offset_minutes=request.tz_offset_minutes)
+    
+    return await run_on_services(analyze_history)
+
+@app.get("/mood/{user_id}/summary")
+async def get_mood_summary(user_id: str):
+    """
+    Rolling aggregates over a user's recent mood entries
+    
+    Maintained on every insert, so this is a single lookup regardless of
+    history length: recent window, negative/low-energy counts and streaks.
+    """
+    require_services()
+    return await run_on_services(get_mood_store().summary, user_id)
+
+@app.get("/mood/{user_id}")
+async def get_mood_entries(user_id: str, limit: Optional[int] = None, since: Optional[float] = None):
+    """A user's stored mood entries, oldest first (optionally the last `limit` or those after `since`)"""
+    require_services()
+    entries = await run_on_services(get_mood_store().entries, user_id, limit, since)
+    return {"user_id": user_id, "entries": entries}
+
+@app.delete("/mood/{user_id}")
+async def delete_mood_entries(user_id: str):
+    """Delete a user's stored mood history"""
+    require_services()
+    deleted = await run_on_services(get_mood_store().delete_user, user_id)
+    return {"user_id": user_id, "deleted": deleted}
+
+@app.websocket("/ws/safety")
+async def safety_stream(websocket: WebSocket):
+    """
+    Streaming safety check for chat input
+    
+    The client sends JSON messages {"chunk": "...", "final": false} as the user
+    types or as messages arrive; "final": true marks the end of a message. Each
+    message is answered with the risk assessment for the current message so
+    far plus the phrases the chunk completed (new_matches). Only the new chunk
+    is scanned each time, and the next message starts a fresh scan. Malformed
+    messages are answered with {"error": "..."} and the connection stays open.
+    """
+    await websocket.accept()
+    if StreamingSafetyScanner is None:
+        await websocket.close(code=1011, reason="Safety service not available")
+        return
+    
+    scanner = StreamingSafetyScanner()
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_json({"error": "Message must be JSON"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"error": "Message must be a JSON object"})
+                continue
+            chunk = message.get("chunk", "")
+            if not isinstance(chunk, str):
+                await websocket.send_json({"error": "chunk must be a string"})
+                continue
+            
+            new_matches = scanner.feed(chunk)
+            final = bool(message.get("final"))
+            if final:
+                new_matches += scanner.flush()
+            
+            result = scanner.result()
+            result["new_matches"] = [
+                {"phrase": phrase, "category": category, "start": start, "end": end}
+                for start, end, phrase, category in new_matches
+            ]
+            await websocket.send_json(result)
+            if final:
+                scanner = StreamingSafetyScanner()
+    except WebSocketDisconnect:
+        pass
 
 if __name__ == "__main__":
     import uvicorn
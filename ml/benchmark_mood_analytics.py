@@ -0,0 +1,168 @@
+"""
+Benchmark mood analytics: NumPy implementation vs plain Python loops
+Records a synthetic mood history (months of entries with mood shifts) in a
+temporary MoodStore and times the POST /mood/analytics user_id path (loading
+the arrays, then services.mood_analytics) against a loop-based version of the
+same metrics
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+
+from services.suggestions import EMOTION_CATEGORIES, normalize_emotion
+from services.mood_store import NEGATIVE_EMOTIONS, MoodStore
+from services.mood_analytics import MOOD_SCORES, SECONDS_PER_DAY, mood_analytics
+
+# Labels as clients send them: GoEmotions and app categories
+LABELS = {
+    'positive': ['joy', 'amusement', 'gratitude', 'happy', 'optimism', 'neutral'],
+    'negative': ['sadness', 'anger', 'nervousness', 'fear', 'sad', 'stressed', 'low_energy', 'neutral'],
+}
+
+def synthetic_history(count: int, days: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """`count` entries spread over `days` days, alternating between good and bad periods"""
+    rng = random.Random(seed)
+    start = 1_700_000_000.0
+    timestamps = sorted(start + rng.random() * days * SECONDS_PER_DAY for _ in range(count))
+    entries = []
+    for timestamp in timestamps:
+        period = int((timestamp - start) // (21 * SECONDS_PER_DAY))  # three-week phases
+        mood = 'negative' if period % 2 else 'positive'
+        if rng.random() < 0.2:
+            mood = 'negative' if mood == 'positive' else 'positive'
+        entries.append({'emotion': rng.choice(LABELS[mood]), 'timestamp': timestamp})
+    return entries
+
+def analytics_loops(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Frequencies, daily means, streaks and weekday counts with Python loops"""
+    emotions = [normalize_emotion(entry['emotion']) for entry in entries]
+    frequencies = Counter(emotions)
+    
+    day_scores = defaultdict(list)
+    weekday_counts = Counter()
+    for entry, emotion in zip(entries, emotions):
+        day = int(entry['timestamp'] // SECONDS_PER_DAY)
+        day_scores[day].append(MOOD_SCORES[emotion])
+        weekday_counts[(day + 3) % 7] += 1
+    daily_means = {day: sum(scores) / len(scores) for day, scores in day_scores.items()}
+    
+    longest = defaultdict(int)
+    longest_negative = run = negative_run = 0
+    previous = None
+    for emotion in emotions:
+        run = run + 1 if emotion == previous else 1
+        longest[emotion] = max(longest[emotion], run)
+        negative_run = negative_run + 1 if emotion in NEGATIVE_EMOTIONS else 0
+        longest_negative = max(longest_negative, negative_run)
+        previous = emotion
+    
+    return {
+        'frequencies': {category: frequencies.get(category, 0) for category in EMOTION_CATEGORIES},
+        'daily_means': daily_means,
+        'longest': {category: longest.get(category, 0) for category in EMOTION_CATEGORIES},
+        'longest_negative': longest_negative,
+        'weekday_counts': [weekday_counts.get(i, 0) for i in range(7)],
+    }
+
+def best_ms(fn, repeats: int, setup=None) -> float:
+    """Best wall time of fn() over repeats, running setup() untimed before each"""
+    best = float('inf')
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def fill_store(store: MoodStore, user_id: str, entries: List[Dict[str, Any]]):
+    """Record a history through add_entry, as /mood and /analyze do"""
+    for entry in entries:
+        store.add_entry(user_id, entry['emotion'], timestamp=entry['timestamp'])
+
+def analyze_user(store: MoodStore, user_id: str) -> Dict[str, Any]:
+    """What POST /mood/analytics does for a stored user_id"""
+    timestamps, codes = store.timeline_arrays(user_id)
+    return mood_analytics(timestamps, codes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mood analytics")
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="History sizes to test")
+    parser.add_argument("--days", type=int, default=180, help="Days the history spans")
+    parser.add_argument("--repeats", type=int, default=20, help="Timing repeats (best is reported)")
+    parser.add_argument("--budget-ms", type=float, default=5.0,
+                        help="Fail if a user_id request with a cached history exceeds this at the largest size")
+    args = parser.parse_args()
+    
+    print("=" * 78)
+    print("Mood analytics benchmark")
+    print("=" * 78)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'mood.db')
+        store = MoodStore(path)
+        histories = {}
+        for count in args.entries:
+            print(f"Recording {count} entries...")
+            histories[count] = synthetic_history(count, args.days)
+            fill_store(store, f"user-{count}", histories[count])
+        store.close()
+        
+        print(f"\n{'entries':>10} {'cold ms':>10} {'cached ms':>10} {'loops ms':>10} {'speedup':>9} {'agree':>7}")
+        cached_ms = 0.0
+        for count, entries in histories.items():
+            user_id = f"user-{count}"
+            stores = []
+            
+            def fresh_store():
+                stores.append(MoodStore(path))
+            
+            cold_ms = best_ms(lambda: analyze_user(stores[-1], user_id), min(args.repeats, 5), fresh_store)
+            result = analyze_user(stores[-1], user_id)
+            for opened in stores[:-1]:
+                opened.close()
+            store = stores[-1]
+            loops_ms = best_ms(lambda: analytics_loops(entries), args.repeats)
+            
+            reference = analytics_loops(entries)
+            daily = dict(zip(result['daily']['dates'], result['daily']['mean_score']))
+            agree = (
+                {c: f['count'] for c, f in result['frequencies'].items()} == reference['frequencies']
+                and result['streaks']['longest'] == reference['longest']
+                and result['streaks']['longest_negative'] == reference['longest_negative']
+                and [d['count'] for d in result['day_of_week']] == reference['weekday_counts']
+                and all(
+                    abs(daily[time.strftime('%Y-%m-%d', time.gmtime(day * SECONDS_PER_DAY))] - mean) < 1e-3
+                    for day, mean in reference['daily_means'].items()
+                )
+            )
+            
+            # Steady state: the user logged another entry since the last request
+            cached_ms = best_ms(lambda: analyze_user(store, user_id), args.repeats,
+                                lambda: store.add_entry(user_id, 'joy'))
+            store.close()
+            print(f"{count:>10} {cold_ms:>10.2f} {cached_ms:>10.2f} {loops_ms:>10.2f} "
+                  f"{loops_ms / cached_ms:>8.1f}x {str(agree):>7}")
+    
+    print(f"\nChange points at {args.entries[-1]} entries:")
+    for point in result['change_points']:
+        print(f"  {point['date']}: {point['before']:.2f} -> {point['after']:.2f} ({point['shift']:+.2f})")
+    
+    print("\nBoth columns time the whole user_id request: loading the history from")
+    print("SQLite as arrays, then mood_analytics. 'cold' is the first request in a")
+    print("process; 'cached' is a later one after a new entry was added (only that")
+    print("entry is read). 'loops' is the loop-based version on entry dictionaries.")
+    if cached_ms > args.budget_ms:
+        print(f"\nFAIL: {cached_ms:.2f} ms exceeds the {args.budget_ms:.1f} ms budget")
+        sys.exit(1)
+    print(f"\nOK: {cached_ms:.2f} ms within the {args.budget_ms:.1f} ms budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark tone detection: per-keyword substring scan vs the Aho-Corasick matcher
+Pads TONE_KEYWORDS with synthetic keywords to show how each approach scales
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from services.keyword_matcher import KeywordMatcher
+from services.sentiment_enhanced import TONE_KEYWORDS
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'to', 'vi', 'ze', 'qu', 'an', 'er', 'is', 'ol', 'un']
+FILLER_WORDS = [
+    'i', 'feel', 'today', 'really', 'the', 'work', 'was', 'and', 'my', 'friend', 'said', 'that',
+    'it', 'is', 'so', 'about', 'this', 'week', 'but', 'not', 'sure', 'what', 'to', 'do', 'next'
+]
+
+def synthetic_keywords(count: int, seed: int = 42) -> Dict[str, List[str]]:
+    """TONE_KEYWORDS padded with made-up one- and two-word keywords up to `count` in total"""
+    rng = random.Random(seed)
+    groups = {tone: list(keywords) for tone, keywords in TONE_KEYWORDS.items()}
+    tones = list(groups)
+    existing = {keyword for keywords in groups.values() for keyword in keywords}
+    while len(existing) < count:
+        words = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 2))]
+        keyword = ' '.join(words)
+        if keyword not in existing:
+            existing.add(keyword)
+            groups[rng.choice(tones)].append(keyword)
+    return groups
+
+def synthetic_texts(groups: Dict[str, List[str]], count: int, seed: int = 0) -> List[str]:
+    """Chat-length messages of filler words with a few keywords mixed in"""
+    rng = random.Random(seed)
+    keywords = [keyword for keywords in groups.values() for keyword in keywords]
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(FILLER_WORDS) for _ in range(rng.randint(8, 40))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        texts.append(' '.join(words))
+    return texts
+
+def detect_tone_substring(text: str, groups: Dict[str, List[str]]) -> List[str]:
+    """The original detect_tone: one substring search per keyword"""
+    text_lower = text.lower()
+    return [tone for tone, keywords in groups.items() if any(keyword in text_lower for keyword in keywords)]
+
+def time_per_text(fn, texts: List[str], repeats: int) -> float:
+    """Best-of-`repeats` average microseconds per text"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tone keyword matching")
+    parser.add_argument("--keywords", type=int, nargs="+", default=[0, 100, 1000],
+                        help="Keyword list sizes to test (0 = TONE_KEYWORDS only)")
+    parser.add_argument("--texts", type=int, default=2000, help="Number of synthetic messages")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats (best is reported)")
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("Tone detection benchmark")
+    print("=" * 70)
+    print(f"{'keywords':>10} {'substring us':>14} {'matcher us':>12} {'speedup':>9} {'build ms':>10} {'differ':>8}")
+    
+    for count in args.keywords:
+        groups = synthetic_keywords(count)
+        texts = synthetic_texts(groups, args.texts)
+        num_keywords = sum(len(keywords) for keywords in groups.values())
+        
+        start = time.perf_counter()
+        matcher = KeywordMatcher.from_groups(groups)
+        build_ms = (time.perf_counter() - start) * 1000
+        
+        baseline_us = time_per_text(lambda text: detect_tone_substring(text, groups), texts, args.repeats)
+        matcher_us = time_per_text(matcher.labels, texts, args.repeats)
+        
+        # Differences come from whole-word matching ('love' no longer matches 'lovely')
+        differ = sum(
+            set(detect_tone_substring(text, groups)) != matcher.labels(text)
+            for text in texts
+        )
+        print(f"{num_keywords:>10} {baseline_us:>14.1f} {matcher_us:>12.1f} "
+              f"{baseline_us / matcher_us:>8.1f}x {build_ms:>10.1f} {differ:>8}")
+    
+    print("\n'differ' counts texts whose tones differ because the matcher only")
+    print("accepts whole-word matches.")
+
+if __name__ == "__main__":
+    main()
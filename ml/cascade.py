@@ -0,0 +1,88 @@
+"""
+Cascaded text emotion classification
+A lexicon fast path (VADER + tone keywords) answers clear-cut messages directly;
+everything else goes to the transformer model
+"""
+
+from typing import Dict, Optional
+
+from services.sentiment_enhanced import analyze_sentiment_vader, detect_tone
+from services.suggestions import normalize_emotion
+
+# Tone tags from detect_tone mapped to GoEmotions labels, so fast-path answers
+# look like the model's ('calm' has no matching label, and no label normalizes
+# to low_energy, so those are left to the model)
+TONE_TO_LABEL = {
+    'positive': 'joy',
+    'frustrated': 'annoyance',
+    'confused': 'confusion',
+    'overwhelmed': 'confusion',
+}
+
+# Expected VADER polarity per label: +1 positive, -1 negative
+LABEL_POLARITY = {
+    'joy': 1,
+    'annoyance': -1,
+    'confusion': -1,
+}
+
+class LexiconFastPath:
+    """
+    Cheap first-stage classifier over VADER scores and tone keywords
+    
+    Answers only when the detected tones agree on a single label and the
+    VADER compound score has the polarity that label implies; otherwise it
+    abstains and the model decides.
+    """
+    
+    def __init__(self, min_confidence: float = 0.8, positive_only_compound: float = 0.8):
+        """
+        Args:
+            min_confidence: Minimum fast-path confidence required to answer
+            positive_only_compound: VADER compound above which text with no tone
+                keywords is still answered as 'joy'
+        """
+        self.min_confidence = min_confidence
+        self.positive_only_compound = positive_only_compound
+    
+    def classify(self, text: str) -> Optional[Dict[str, object]]:
+        """
+        Classify text with the lexicon stage
+        
+        Returns:
+            Dictionary with 'emotion' (GoEmotions label), 'category' (its
+            normalized category), 'confidence', 'tones' and 'compound', or
+            None to defer to the model
+        """
+        compound = analyze_sentiment_vader(text).get('compound', 0.0)
+        tones = detect_tone(text)
+        labels = {TONE_TO_LABEL[tone] for tone in tones if tone in TONE_TO_LABEL}
+        
+        if len(labels) > 1:
+            return None
+        
+        if labels:
+            emotion = labels.pop()
+            if compound * LABEL_POLARITY[emotion] <= 0:
+                return None
+            confidence = 0.5 + 0.5 * abs(compound)
+        elif compound >= self.positive_only_compound:
+            emotion = 'joy'
+            confidence = compound
+        else:
+            return None
+        
+        if confidence < self.min_confidence:
+            return None
+        
+        return {
+            'emotion': emotion,
+            'category': normalize_emotion(emotion),
+            'confidence': float(confidence),
+            'tones': tones,
+            'compound': compound
+        }
+
+def categories_agree(model_emotion: str, fast_emotion: str) -> bool:
+    """Whether a model label and a fast-path label fall in the same normalized category"""
+    return normalize_emotion(model_emotion) == normalize_emotion(fast_emotion)
@@ -0,0 +1,118 @@
+"""
+Export the DistilBERT emotion classifier to ONNX for onnxruntime inference
+"""
+import os
+import sys
+import argparse
+
+import torch
+from transformers import DistilBertTokenizer, DistilBertForSequenceClassification
+
+from inference import ONNX_FILENAME
+
+def export_onnx(model_path: str = "checkpoints/best_model", output_path: str = None, opset: int = 17) -> bool:
+    """
+    Export the text model to an ONNX graph with dynamic batch and sequence axes
+    
+    Args:
+        model_path: Directory containing the fine-tuned model and tokenizer
+        output_path: Where to write the graph (defaults to <model_path>/model.onnx)
+        opset: ONNX opset version
+        
+    Returns:
+        True if the export succeeded
+    """
+    print("=" * 70)
+    print("Exporting Text Emotion Model to ONNX")
+    print("=" * 70)
+    
+    if not os.path.exists(model_path):
+        print(f"ERROR: Model not found at {model_path}")
+        print("Please train the model first using: python train_model.py")
+        return False
+    
+    output_path = output_path or os.path.join(model_path, ONNX_FILENAME)
+    
+    try:
+        print(f"[INFO] Loading model from {model_path}...")
+        tokenizer = DistilBertTokenizer.from_pretrained(model_path)
+        model = DistilBertForSequenceClassification.from_pretrained(model_path)
+        model.eval()
+        
+        # Sample input only fixes the graph structure; batch and sequence stay dynamic
+        sample = tokenizer(
+            ["I am happy", "I feel really anxious about the upcoming exam"],
+            padding=True,
+            return_tensors="pt"
+        )
+        
+        print(f"[INFO] Exporting to {output_path} (opset {opset})...")
+        dynamic_axes = {
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"}
+        }
+        export_kwargs = dict(
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+        with torch.no_grad():
+            try:
+                # Newer torch defaults to the dynamo exporter; keep the dynamic_axes path
+                torch.onnx.export(
+                    model,
+                    (sample["input_ids"], sample["attention_mask"]),
+                    output_path,
+                    dynamo=False,
+                    **export_kwargs
+                )
+            except TypeError:
+                torch.onnx.export(
+                    model,
+                    (sample["input_ids"], sample["attention_mask"]),
+                    output_path,
+                    **export_kwargs
+                )
+        
+        size = os.path.getsize(output_path) / (1024 * 1024)
+        print(f"[OK] ONNX graph saved to {output_path} ({size:.1f} MB)")
+        
+        # Verify the graph against eager PyTorch
+        try:
+            import numpy as np
+            import onnxruntime as ort
+            session = ort.InferenceSession(output_path, providers=["CPUExecutionProvider"])
+            onnx_logits = session.run(
+                ["logits"],
+                {
+                    "input_ids": sample["input_ids"].numpy(),
+                    "attention_mask": sample["attention_mask"].numpy()
+                }
+            )[0]
+            with torch.no_grad():
+                torch_logits = model(**sample).logits.numpy()
+            max_diff = float(np.abs(onnx_logits - torch_logits).max())
+            print(f"[OK] Max logit difference vs PyTorch: {max_diff:.6f}")
+        except ImportError:
+            print("[INFO] onnxruntime not installed, skipping verification")
+            print("Install with: pip install onnxruntime")
+        
+        return True
+    except Exception as e:
+        print(f"ERROR: Export failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the text emotion model to ONNX")
+    parser.add_argument("--model-path", default="checkpoints/best_model", help="Fine-tuned model directory")
+    parser.add_argument("--output", default=None, help="Output .onnx path (default: <model-path>/model.onnx)")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset version")
+    args = parser.parse_args()
+    
+    success = export_onnx(args.model_path, args.output, args.opset)
+    sys.exit(0 if success else 1)
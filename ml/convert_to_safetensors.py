@@ -0,0 +1,75 @@
+"""
+Convert a pytorch_model.bin text model checkpoint to model.safetensors
+"""
+import os
+import sys
+import argparse
+
+import torch
+from transformers import DistilBertForSequenceClassification
+
+from inference import SAFETENSORS_FILENAME
+
+LEGACY_WEIGHTS_FILENAME = "pytorch_model.bin"
+
+def convert_to_safetensors(model_path: str = "checkpoints/best_model", keep_bin: bool = False) -> bool:
+    """
+    Rewrite a checkpoint's weights as model.safetensors
+    
+    safetensors weights are memory-mapped on load instead of being unpickled
+    into freshly allocated memory, which makes server cold starts faster and
+    lets pre-forked workers share the file's pages. Run this once after
+    training (or on an older checkpoint); the server never modifies the
+    model directory itself.
+    
+    Args:
+        model_path: Directory containing the fine-tuned model
+        keep_bin: Keep pytorch_model.bin next to the new file (by default it is
+            removed once the converted weights are verified, so the directory
+            holds a single copy of the weights)
+    
+    Returns:
+        True if the directory holds safetensors weights
+    """
+    safetensors_path = os.path.join(model_path, SAFETENSORS_FILENAME)
+    bin_path = os.path.join(model_path, LEGACY_WEIGHTS_FILENAME)
+    
+    if not os.path.exists(bin_path):
+        if os.path.exists(safetensors_path):
+            print(f"[OK] {model_path} already uses {SAFETENSORS_FILENAME}")
+            return True
+        print(f"ERROR: No {LEGACY_WEIGHTS_FILENAME} found in {model_path}")
+        return False
+    
+    try:
+        if not os.path.exists(safetensors_path):
+            print(f"[INFO] Converting {bin_path} to {SAFETENSORS_FILENAME}...")
+            model = DistilBertForSequenceClassification.from_pretrained(model_path, use_safetensors=False)
+            model.save_pretrained(model_path, safe_serialization=True)
+        
+        # Both files must hold the same weights before the original goes
+        legacy = DistilBertForSequenceClassification.from_pretrained(model_path, use_safetensors=False).state_dict()
+        converted = DistilBertForSequenceClassification.from_pretrained(model_path, use_safetensors=True).state_dict()
+        if legacy.keys() != converted.keys() or not all(torch.equal(legacy[k], converted[k]) for k in legacy):
+            print(f"ERROR: {SAFETENSORS_FILENAME} does not match {LEGACY_WEIGHTS_FILENAME}; keeping both")
+            return False
+        print(f"[OK] Weights saved to {safetensors_path}")
+        
+        if not keep_bin:
+            os.remove(bin_path)
+            print(f"[OK] Removed {bin_path}")
+        return True
+    except Exception as e:
+        print(f"ERROR: Conversion failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the text emotion model to safetensors")
+    parser.add_argument("--model-path", default="checkpoints/best_model", help="Fine-tuned model directory")
+    parser.add_argument("--keep-bin", action="store_true", help=f"Keep {LEGACY_WEIGHTS_FILENAME} after converting")
+    args = parser.parse_args()
+    
+    success = convert_to_safetensors(args.model_path, args.keep_bin)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,224 @@
+"""
+Knowledge distillation of the DistilBERT emotion classifier into a compact student
+The student is a 2-layer, 256-dim DistilBERT over the same tokenizer, trained on
+the teacher's (best_model) logits on the GoEmotions split
+"""
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+from transformers import (
+    DistilBertConfig,
+    DistilBertTokenizer,
+    DistilBertForSequenceClassification,
+    get_linear_schedule_with_warmup
+)
+from torch.optim import AdamW
+import os
+import json
+from tqdm import tqdm
+
+from train_model import EmotionDataset, load_and_prepare_data, evaluate
+
+# Configuration
+CONFIG = {
+    "teacher_dir": "checkpoints/best_model",
+    "student_dir": "checkpoints/student_model",
+    "n_layers": 2,
+    "dim": 256,
+    "hidden_dim": 1024,
+    "n_heads": 4,
+    "max_length": 128,
+    "batch_size": 32,
+    "learning_rate": 5e-4,
+    "epochs": 6,
+    "warmup_steps": 200,
+    "temperature": 2.0,
+    "alpha": 0.7,  # Weight of the soft (teacher) loss; 1 - alpha goes to the hard labels
+    "patience": 2,
+}
+
+def build_student(teacher) -> DistilBertForSequenceClassification:
+    """
+    Create the student with the teacher's vocabulary and label mappings
+    
+    Word embeddings are initialized from the teacher's, projected onto their top
+    principal components, which gives the small model a useful starting point.
+    """
+    teacher_config = teacher.config
+    config = DistilBertConfig(
+        vocab_size=teacher_config.vocab_size,
+        max_position_embeddings=teacher_config.max_position_embeddings,
+        n_layers=CONFIG["n_layers"],
+        n_heads=CONFIG["n_heads"],
+        dim=CONFIG["dim"],
+        hidden_dim=CONFIG["hidden_dim"],
+        num_labels=teacher_config.num_labels,
+        id2label=teacher_config.id2label,
+        label2id=teacher_config.label2id,
+        pad_token_id=teacher_config.pad_token_id
+    )
+    student = DistilBertForSequenceClassification(config)
+    
+    with torch.no_grad():
+        teacher_embeddings = teacher.distilbert.embeddings.word_embeddings.weight
+        centered = teacher_embeddings - teacher_embeddings.mean(dim=0, keepdim=True)
+        _, _, components = torch.pca_lowrank(centered, q=CONFIG["dim"], center=False)
+        projected = centered @ components[:, :CONFIG["dim"]]
+        projected = projected / projected.std() * student.config.initializer_range * 10
+        student.distilbert.embeddings.word_embeddings.weight.copy_(projected)
+    
+    return student
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature: float, alpha: float):
+    """Soft-target KL divergence (scaled by T^2) blended with hard-label cross-entropy"""
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher_logits / temperature, dim=1),
+        reduction="batchmean"
+    ) * (temperature ** 2)
+    hard = F.cross_entropy(student_logits, labels)
+    return alpha * soft + (1 - alpha) * hard
+
+def distill_epoch(student, teacher, dataloader, optimizer, scheduler, device):
+    """Train the student for one epoch against the teacher's logits"""
+    student.train()
+    total_loss = 0
+    
+    progress_bar = tqdm(dataloader, desc="Distilling")
+    for batch in progress_bar:
+        optimizer.zero_grad()
+        
+        input_ids = batch["input_ids"].to(device)
+        attention_mask = batch["attention_mask"].to(device)
+        labels = batch["labels"].to(device)
+        
+        with torch.no_grad():
+            teacher_logits = teacher(input_ids=input_ids, attention_mask=attention_mask).logits
+        student_logits = student(input_ids=input_ids, attention_mask=attention_mask).logits
+        
+        loss = distillation_loss(student_logits, teacher_logits, labels, CONFIG["temperature"], CONFIG["alpha"])
+        total_loss += loss.item()
+        
+        loss.backward()
+        torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+        optimizer.step()
+        scheduler.step()
+        
+        progress_bar.set_postfix({"loss": loss.item()})
+    
+    return total_loss / len(dataloader)
+
+def compare_with_teacher(X_test, y_test):
+    """Size / latency / F1 comparison of the saved student against the teacher"""
+    from inference import EmotionClassifier
+    from evaluate_model import benchmark_classifier, weights_size_mb
+    
+    report = {}
+    for name, path in [("teacher", CONFIG["teacher_dir"]), ("student", CONFIG["student_dir"])]:
+        classifier = EmotionClassifier(path)
+        results = benchmark_classifier(classifier, X_test, y_test)
+        results["model_size_mb"] = weights_size_mb(classifier.model_path)
+        results["parameters"] = sum(p.numel() for p in classifier.model.parameters())
+        report[name] = results
+    
+    print("\n=== Teacher vs Student ===")
+    print(f"{'metric':<18}{'teacher':>14}{'student':>14}")
+    for metric in ["accuracy", "f1_macro", "latency_p50_ms", "latency_p99_ms", "model_size_mb", "parameters"]:
+        print(f"{metric:<18}{report['teacher'][metric]:>14.4f}{report['student'][metric]:>14.4f}")
+    
+    with open(os.path.join(CONFIG["student_dir"], "distillation_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {CONFIG['student_dir']}/distillation_report.json")
+    return report
+
+def distill():
+    """Main distillation function"""
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Using device: {device}")
+    
+    if not os.path.exists(CONFIG["teacher_dir"]):
+        print(f"Error: Teacher model not found at {CONFIG['teacher_dir']}")
+        print("Please train the model first using: python train_model.py")
+        return
+    
+    (X_train, y_train), (X_val, y_val), (X_test, y_test), _, _ = load_and_prepare_data()
+    
+    print("Loading teacher and building student...")
+    tokenizer = DistilBertTokenizer.from_pretrained(CONFIG["teacher_dir"])
+    teacher = DistilBertForSequenceClassification.from_pretrained(CONFIG["teacher_dir"])
+    teacher.to(device)
+    teacher.eval()
+    
+    student = build_student(teacher)
+    student.to(device)
+    teacher_params = sum(p.numel() for p in teacher.parameters())
+    student_params = sum(p.numel() for p in student.parameters())
+    print(f"Teacher parameters: {teacher_params:,}")
+    print(f"Student parameters: {student_params:,} ({student_params / teacher_params:.1%} of teacher)")
+    
+    train_loader = DataLoader(
+        EmotionDataset(X_train, y_train, tokenizer, CONFIG["max_length"]),
+        batch_size=CONFIG["batch_size"],
+        shuffle=True
+    )
+    val_loader = DataLoader(
+        EmotionDataset(X_val, y_val, tokenizer, CONFIG["max_length"]),
+        batch_size=CONFIG["batch_size"],
+        shuffle=False
+    )
+    
+    optimizer = AdamW(student.parameters(), lr=CONFIG["learning_rate"])
+    scheduler = get_linear_schedule_with_warmup(
+        optimizer,
+        num_warmup_steps=CONFIG["warmup_steps"],
+        num_training_steps=len(train_loader) * CONFIG["epochs"]
+    )
+    
+    os.makedirs(CONFIG["student_dir"], exist_ok=True)
+    best_val_f1 = -1.0
+    patience_counter = 0
+    history = []
+    
+    print("\nStarting distillation...")
+    for epoch in range(CONFIG["epochs"]):
+        print(f"\nEpoch {epoch + 1}/{CONFIG['epochs']}")
+        
+        train_loss = distill_epoch(student, teacher, train_loader, optimizer, scheduler, device)
+        val_accuracy, val_f1, val_loss = evaluate(student, val_loader, device)
+        
+        print(f"Train Loss: {train_loss:.4f}")
+        print(f"Val Accuracy: {val_accuracy:.4f}")
+        print(f"Val F1-Macro: {val_f1:.4f}")
+        history.append({
+            "epoch": epoch + 1,
+            "train_loss": train_loss,
+            "val_loss": val_loss,
+            "val_accuracy": val_accuracy,
+            "val_f1": val_f1
+        })
+        
+        if val_f1 > best_val_f1:
+            best_val_f1 = val_f1
+            patience_counter = 0
+            print(f"New best F1 score: {val_f1:.4f}. Saving student...")
+            # Same layout as best_model, so EmotionClassifier loads it directly
+            student.save_pretrained(CONFIG["student_dir"], safe_serialization=True)
+            tokenizer.save_pretrained(CONFIG["student_dir"])
+        else:
+            patience_counter += 1
+            print(f"No improvement. Patience: {patience_counter}/{CONFIG['patience']}")
+        
+        if patience_counter >= CONFIG["patience"]:
+            print(f"Early stopping triggered after {epoch + 1} epochs")
+            break
+    
+    with open(os.path.join(CONFIG["student_dir"], "distillation_history.json"), "w") as f:
+        json.dump(history, f, indent=2)
+    
+    compare_with_teacher(X_test, y_test)
+    print(f"\nStudent saved to: {CONFIG['student_dir']}")
+    print("Serve it with: EMOTION_MODEL_DIR=checkpoints/student_model python api_server.py")
+
+if __name__ == "__main__":
+    distill()
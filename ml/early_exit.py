@@ -0,0 +1,170 @@
+"""
+Early-exit inference for the DistilBERT emotion classifier
+Lightweight classifier heads after intermediate transformer layers let confident
+inputs skip the remaining layers
+"""
+
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import torch
+import torch.nn as nn
+
+# File written by `python train_model.py --early-exit-heads` inside the model directory
+EARLY_EXIT_HEADS_FILENAME = "early_exit_heads.pt"
+
+# Default layers (1-indexed) that get an exit head; the last layer uses the model's own classifier
+DEFAULT_EXIT_LAYERS = (1, 2, 3, 4, 5)
+
+class EarlyExitHeads(nn.Module):
+    """Small classifier heads over the [CLS] state of intermediate layers"""
+    
+    def __init__(self, dim: int, num_labels: int, exit_layers: Sequence[int] = DEFAULT_EXIT_LAYERS, head_dim: int = 256):
+        super().__init__()
+        self.dim = dim
+        self.num_labels = num_labels
+        self.head_dim = head_dim
+        self.exit_layers = sorted(int(layer) for layer in exit_layers)
+        self.heads = nn.ModuleDict({
+            str(layer): nn.Sequential(
+                nn.Dropout(0.1),
+                nn.Linear(dim, head_dim),
+                nn.Tanh(),
+                nn.Linear(head_dim, num_labels)
+            )
+            for layer in self.exit_layers
+        })
+    
+    def forward(self, layer: int, cls_state: torch.Tensor) -> torch.Tensor:
+        """Logits of the head after `layer` for a batch of [CLS] states"""
+        return self.heads[str(layer)](cls_state)
+    
+    def save(self, path: str):
+        torch.save({
+            "dim": self.dim,
+            "num_labels": self.num_labels,
+            "head_dim": self.head_dim,
+            "exit_layers": self.exit_layers,
+            "state_dict": self.state_dict()
+        }, path)
+    
+    @classmethod
+    def load(cls, path: str, map_location="cpu") -> "EarlyExitHeads":
+        checkpoint = torch.load(path, map_location=map_location)
+        heads = cls(
+            checkpoint["dim"],
+            checkpoint["num_labels"],
+            checkpoint["exit_layers"],
+            checkpoint.get("head_dim", 256)
+        )
+        heads.load_state_dict(checkpoint["state_dict"])
+        heads.eval()
+        return heads
+
+def _prepare_attention_mask(distilbert, embeddings: torch.Tensor, attention_mask: torch.Tensor):
+    """Build the attention mask in the form the installed transformers' layers expect"""
+    try:
+        from transformers.masking_utils import create_bidirectional_mask
+    except ImportError:
+        # Older transformers: eager attention layers take the (batch, seq_len) mask directly
+        return attention_mask
+    return create_bidirectional_mask(
+        config=distilbert.config,
+        inputs_embeds=embeddings,
+        attention_mask=attention_mask
+    )
+
+def _run_layer(layer: nn.Module, hidden: torch.Tensor, mask) -> torch.Tensor:
+    output = layer(hidden, mask)
+    # Older transformers return a tuple whose last element is the hidden state
+    return output[-1] if isinstance(output, tuple) else output
+
+def _select_rows(mask, keep: torch.Tensor):
+    return mask[keep] if mask is not None else None
+
+def layer_cls_states(model, input_ids: torch.Tensor, attention_mask: torch.Tensor, layers: Sequence[int]) -> Dict[int, torch.Tensor]:
+    """
+    Run the full encoder and collect the [CLS] state after each requested layer
+    
+    Used to train the exit heads on exactly the states they see at inference.
+    """
+    distilbert = model.distilbert
+    hidden = distilbert.embeddings(input_ids)
+    mask = _prepare_attention_mask(distilbert, hidden, attention_mask)
+    wanted = set(layers)
+    
+    states = {}
+    for index, layer in enumerate(distilbert.transformer.layer, start=1):
+        hidden = _run_layer(layer, hidden, mask)
+        if index in wanted:
+            states[index] = hidden[:, 0]
+    return states
+
+def _final_head(model, cls_state: torch.Tensor) -> torch.Tensor:
+    """The fine-tuned model's own classifier head (matches DistilBertForSequenceClassification)"""
+    pooled = model.pre_classifier(cls_state)
+    pooled = nn.ReLU()(pooled)
+    pooled = model.dropout(pooled)
+    return model.classifier(pooled)
+
+def early_exit_forward(
+    model,
+    heads: EarlyExitHeads,
+    input_ids: torch.Tensor,
+    attention_mask: torch.Tensor,
+    threshold: float
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Run the encoder layer by layer, finishing each row at the first exit head
+    whose top-class probability reaches `threshold`
+    
+    Finished rows are dropped from the batch, so later layers only process
+    the inputs that are still uncertain.
+    
+    Returns:
+        Tuple of (probabilities of shape (batch, num_labels),
+        1-indexed layer each row exited at)
+    """
+    distilbert = model.distilbert
+    layers = distilbert.transformer.layer
+    num_layers = len(layers)
+    batch_size = input_ids.shape[0]
+    
+    hidden = distilbert.embeddings(input_ids)
+    mask = _prepare_attention_mask(distilbert, hidden, attention_mask)
+    
+    active = torch.arange(batch_size, device=input_ids.device)
+    probs = torch.zeros(batch_size, heads.num_labels, device=input_ids.device)
+    exit_layer = torch.full((batch_size,), num_layers, dtype=torch.long, device=input_ids.device)
+    exit_layers = set(heads.exit_layers)
+    
+    for index, layer in enumerate(layers, start=1):
+        hidden = _run_layer(layer, hidden, mask)
+        if index == num_layers or index not in exit_layers:
+            continue
+        
+        head_probs = torch.softmax(heads(index, hidden[:, 0]), dim=1)
+        done = head_probs.max(dim=1).values >= threshold
+        if not done.any():
+            continue
+        
+        probs[active[done]] = head_probs[done]
+        exit_layer[active[done]] = index
+        keep = ~done
+        active = active[keep]
+        if active.numel() == 0:
+            return probs, exit_layer
+        hidden = hidden[keep]
+        mask = _select_rows(mask, keep)
+    
+    probs[active] = torch.softmax(_final_head(model, hidden[:, 0]), dim=1)
+    return probs, exit_layer
+
+def load_early_exit_heads(model_path: str, device) -> Optional[EarlyExitHeads]:
+    """Load the exit heads saved next to a model, or None if they were never trained"""
+    path = os.path.join(model_path, EARLY_EXIT_HEADS_FILENAME)
+    if not os.path.exists(path):
+        return None
+    heads = EarlyExitHeads.load(path, map_location=device)
+    heads.to(device)
+    return heads
@@ -0,0 +1,91 @@
+"""
+Measure how much GoEmotions test traffic the lexicon fast path can answer,
+and how often it agrees with the full model
+"""
+
+import os
+import json
+import time
+import argparse
+from collections import Counter
+
+from inference import EmotionClassifier
+from evaluate_model import load_and_prepare_test_data
+from cascade import LexiconFastPath, categories_agree
+from services.suggestions import normalize_emotion
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the lexicon fast path against the full model")
+    parser.add_argument("--model-path", default="checkpoints/best_model", help="Model directory")
+    parser.add_argument("--min-confidence", type=float, default=0.8, help="Fast-path confidence threshold")
+    parser.add_argument("--output", default="checkpoints/cascade_report.json", help="Report output path")
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.model_path):
+        print(f"Error: Model not found at {args.model_path}")
+        print("Please train the model first using: python train_model.py")
+        return
+    
+    X_test, y_test, _, id_to_label = load_and_prepare_test_data()
+    fast_path = LexiconFastPath(min_confidence=args.min_confidence)
+    
+    print(f"Running lexicon fast path on {len(X_test)} test examples...")
+    start = time.perf_counter()
+    fast_results = [fast_path.classify(text) for text in X_test]
+    fast_seconds = time.perf_counter() - start
+    
+    classifier = EmotionClassifier(args.model_path)
+    print("Running full model...")
+    start = time.perf_counter()
+    probs = classifier.predict_proba(X_test)
+    model_seconds = time.perf_counter() - start
+    model_labels = [classifier.id_to_label.get(int(idx), "neutral") for idx in probs.argmax(axis=1)]
+    
+    answered = [i for i, result in enumerate(fast_results) if result is not None]
+    agree_model = sum(categories_agree(model_labels[i], fast_results[i]['emotion']) for i in answered)
+    agree_gold = sum(categories_agree(id_to_label[y_test[i]], fast_results[i]['emotion']) for i in answered)
+    model_gold = sum(
+        normalize_emotion(model_labels[i]) == normalize_emotion(id_to_label[y_test[i]]) for i in answered
+    )
+    
+    per_category = Counter(fast_results[i]['category'] for i in answered)
+    per_category_agree = Counter(
+        fast_results[i]['category'] for i in answered
+        if categories_agree(model_labels[i], fast_results[i]['emotion'])
+    )
+    
+    report = {
+        "test_examples": len(X_test),
+        "min_confidence": args.min_confidence,
+        "fast_path_fraction": len(answered) / len(X_test) if X_test else 0.0,
+        "agreement_with_model": agree_model / len(answered) if answered else 0.0,
+        "fast_path_gold_agreement": agree_gold / len(answered) if answered else 0.0,
+        "model_gold_agreement_on_fast_subset": model_gold / len(answered) if answered else 0.0,
+        "fast_path_ms_per_text": fast_seconds * 1000.0 / max(len(X_test), 1),
+        "model_ms_per_text": model_seconds * 1000.0 / max(len(X_test), 1),
+        "per_category": {
+            category: {
+                "count": count,
+                "agreement_with_model": per_category_agree[category] / count
+            }
+            for category, count in per_category.most_common()
+        }
+    }
+    
+    print("\n=== Cascade Report ===")
+    print(f"Fast path answered: {report['fast_path_fraction']:.1%} of test traffic")
+    print(f"Agreement with model (normalized category): {report['agreement_with_model']:.1%}")
+    print(f"Gold agreement on that subset: fast path {report['fast_path_gold_agreement']:.1%}, "
+          f"model {report['model_gold_agreement_on_fast_subset']:.1%}")
+    print(f"Cost per text: fast path {report['fast_path_ms_per_text']:.3f} ms, "
+          f"model {report['model_ms_per_text']:.3f} ms (batched)")
+    for category, info in report["per_category"].items():
+        print(f"  {category:<12} {info['count']:>6}  agreement {info['agreement_with_model']:.1%}")
+    
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
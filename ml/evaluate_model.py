@@ -10,7 +10,10 @@ from sklearn.metrics import accuracy_score, f1_score
 from sklearn.model_selection import train_test_split
 import json
 import os
+import time
+import numpy as np
 from tqdm import tqdm
+from typing import Dict, List
 from train_model import EmotionDataset
 
 def load_and_prepare_test_data():
@@ -90,7 +93,113 @@ def evaluate(model, dataloader, device):
     
     return accuracy, f1_macro, avg_loss
 
+def weights_size_mb(model_dir: str) -> float:
+    """
+    Size of the model weights in a model directory
+    
+    Counts one weights format, the one the model loads from: .safetensors,
+    else .bin, else .pt (INT8 artifacts), so a checkpoint that still carries
+    a converted pytorch_model.bin is not counted twice.
+    """
+    from early_exit import EARLY_EXIT_HEADS_FILENAME
+    
+    names = [name for name in os.listdir(model_dir) if name != EARLY_EXIT_HEADS_FILENAME]
+    for extension in (".safetensors", ".bin", ".pt"):
+        weight_files = [name for name in names if name.endswith(extension)]
+        if weight_files:
+            return sum(os.path.getsize(os.path.join(model_dir, name)) for name in weight_files) / (1024 * 1024)
+    return 0.0
+
+def benchmark_classifier(
+    classifier,
+    texts: List[str],
+    labels: List[int],
+    latency_samples: int = 500
+) -> Dict[str, float]:
+    """
+    Measure accuracy, F1-macro and single-message latency of an EmotionClassifier
+    
+    Args:
+        classifier: Loaded EmotionClassifier (any backend or artifact)
+        texts: Test texts
+        labels: Integer label ids for `texts`
+        latency_samples: Number of test texts to time one at a time
+    
+    Returns:
+        Dictionary with accuracy, f1_macro, latency_p50_ms and latency_p99_ms
+    """
+    probs = classifier.predict_proba(texts)
+    predictions = probs.argmax(axis=1)
+    
+    # Latency is measured per message, the way the API serves chat traffic
+    latencies = []
+    for text in texts[:latency_samples]:
+        start = time.perf_counter()
+        classifier.predict_proba([text])
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    
+    return {
+        "accuracy": float(accuracy_score(labels, predictions)),
+        "f1_macro": float(f1_score(labels, predictions, average="macro")),
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p99_ms": float(np.percentile(latencies, 99))
+    }
+
+def evaluate_early_exit(model_path: str, thresholds: List[float], X_test: List[str], y_test: List[int]):
+    """
+    Sweep early-exit thresholds and report quality loss against the full model
+    
+    For each threshold, records accuracy, F1-macro, latency and the fraction of
+    test texts that exited after each layer, so a threshold can be chosen with
+    a known cost in F1.
+    """
+    from inference import EmotionClassifier
+    
+    classifier = EmotionClassifier(model_path, early_exit_threshold=thresholds[0])
+    
+    classifier.early_exit_threshold = None
+    full = benchmark_classifier(classifier, X_test, y_test)
+    print(f"\nFull model: accuracy {full['accuracy']:.4f}, F1-macro {full['f1_macro']:.4f}, "
+          f"p50 {full['latency_p50_ms']:.2f} ms")
+    
+    sweep = []
+    for threshold in thresholds:
+        classifier.early_exit_threshold = threshold
+        classifier.reset_exit_stats()
+        classifier.predict_proba(X_test)
+        exit_stats = classifier.exit_stats()
+        
+        results = benchmark_classifier(classifier, X_test, y_test)
+        results["threshold"] = threshold
+        results["f1_macro_loss"] = full["f1_macro"] - results["f1_macro"]
+        results["accuracy_loss"] = full["accuracy"] - results["accuracy"]
+        results["exit_layers"] = exit_stats["layers"]
+        sweep.append(results)
+        
+        exits = ", ".join(
+            f"L{layer}: {info['fraction']:.1%}" for layer, info in exit_stats["layers"].items()
+        )
+        print(f"Threshold {threshold:.2f}: accuracy {results['accuracy']:.4f}, F1-macro {results['f1_macro']:.4f} "
+              f"(loss {results['f1_macro_loss']:+.4f}), p50 {results['latency_p50_ms']:.2f} ms | exits {exits}")
+    
+    report = {"full_model": full, "thresholds": sweep}
+    with open(os.path.join(os.path.dirname(model_path), "early_exit_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nEarly-exit report saved to {os.path.join(os.path.dirname(model_path), 'early_exit_report.json')}")
+    return report
+
 def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Evaluate the text emotion model on the test split")
+    parser.add_argument(
+        "--early-exit-thresholds",
+        type=float,
+        nargs="+",
+        default=None,
+        help="Sweep early-exit confidence thresholds instead of the standard evaluation"
+    )
+    args = parser.parse_args()
+    
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print(f"Using device: {device}")
     
@@ -104,6 +213,10 @@ def main():
     # Load test data
     X_test, y_test, label_to_id, id_to_label = load_and_prepare_test_data()
     
+    if args.early_exit_thresholds:
+        evaluate_early_exit(model_path, args.early_exit_thresholds, X_test, y_test)
+        return
+    
     # Initialize tokenizer and model
     print("Loading model...")
     tokenizer = DistilBertTokenizer.from_pretrained(model_path)
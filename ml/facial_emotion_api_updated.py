@@ -3,8 +3,9 @@ FastAPI server for facial emotion classification using EfficientNet-B1 model
 Updated to work with the new high-accuracy model (224x224 RGB)
 """
 
-from fastapi import FastAPI, HTTPException, File, UploadFile
+from fastapi import FastAPI, HTTPException, File, UploadFile, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict
 import torch
@@ -15,6 +16,7 @@ import io
 import numpy as np
 import os
 from pathlib import Path
+from inference_executor import InferenceExecutor, InferenceOverloadedError
 
 # Try to import timm, install if missing
 try:
@@ -92,6 +94,35 @@ except Exception as e:
     traceback.print_exc()
     model = None
 
+# Forward passes run on a dedicated pool so /health stays responsive; requests
+# beyond FACIAL_MAX_PENDING queued or running get an immediate 503 with Retry-After
+inference_executor = InferenceExecutor(
+    max_workers=int(os.environ.get("FACIAL_INFERENCE_THREADS", "1")),
+    max_pending=int(os.environ.get("FACIAL_MAX_PENDING", "16")),
+    timeout_seconds=float(os.environ.get("FACIAL_REQUEST_TIMEOUT_SECONDS", "10")),
+    retry_after_seconds=float(os.environ.get("FACIAL_RETRY_AFTER_SECONDS", "1"))
+)
+
+@app.exception_handler(InferenceOverloadedError)
+async def inference_overloaded(request: Request, error: InferenceOverloadedError):
+    """Shed load with 503 + Retry-After instead of queueing without bound"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Server busy: {error}"},
+        headers={"Retry-After": str(max(1, round(error.retry_after)))}
+    )
+
+@app.on_event("shutdown")
+async def stop_inference_executor():
+    inference_executor.shutdown()
+
+def predict_probs(image_tensor: torch.Tensor) -> np.ndarray:
+    """Blocking forward pass for one preprocessed image; runs on the inference pool"""
+    with torch.no_grad():
+        outputs = model(image_tensor)
+        probabilities = torch.softmax(outputs, dim=1)
+        return probabilities[0].cpu().numpy()
+
 # Image preprocessing (matches training: 224x224 RGB)
 transform = transforms.Compose([
     transforms.Resize((224, 224)),
@@ -128,6 +159,14 @@ async def health():
         "model_type": "EfficientNet-B1"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Inference queue depth and load-shedding counters"""
+    return {
+        "model_loaded": model is not None,
+        "inference_executor": inference_executor.stats()
+    }
+
 @app.options("/health")
 async def health_options():
     """Handle OPTIONS preflight request for CORS"""
@@ -181,10 +220,7 @@ async def predict_emotion(file: UploadFile = File(...)):
                     image_tensor = image_tensor[:, :3, :, :]  # Take first 3 channels
         
         # Predict
-        with torch.no_grad():
-            outputs = model(image_tensor)
-            probabilities = torch.softmax(outputs, dim=1)
-            probs = probabilities[0].cpu().numpy()
+        probs = await inference_executor.run(predict_probs, image_tensor)
         
         # Get top predictions
         top_indices = probs.argsort()[-7:][::-1]
@@ -201,7 +237,7 @@ async def predict_emotion(file: UploadFile = File(...)):
             top_emotion=EMOTIONS[top_indices[0]],
             top_confidence=float(probs[top_indices[0]])
         )
-    except HTTPException:
+    except (HTTPException, InferenceOverloadedError):
         raise
     except Exception as e:
         import traceback
@@ -243,10 +279,7 @@ async def predict_emotion_base64(data: dict):
                 image_tensor = image_tensor[:, :3, :, :]
         
         # Predict
-        with torch.no_grad():
-            outputs = model(image_tensor)
-            probabilities = torch.softmax(outputs, dim=1)
-            probs = probabilities[0].cpu().numpy()
+        probs = await inference_executor.run(predict_probs, image_tensor)
         
         # Get top predictions
         top_indices = probs.argsort()[-7:][::-1]
@@ -262,6 +295,8 @@ async def predict_emotion_base64(data: dict):
             top_emotion=EMOTIONS[top_indices[0]],
             top_confidence=float(probs[top_indices[0]])
         )
+    except InferenceOverloadedError:
+        raise
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -0,0 +1,191 @@
+"""
+Dedicated executor for blocking inference with admission control
+Keeps the event loop free, bounds the backlog and sheds load early
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+class InferenceOverloadedError(Exception):
+    """Raised when a request can't be served in time; maps to HTTP 503"""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class QueueFullError(InferenceOverloadedError):
+    """The executor already holds its maximum number of pending requests"""
+
+class DeadlineExceededError(InferenceOverloadedError):
+    """The request waited (or ran) past its deadline"""
+
+class InferenceExecutor:
+    """
+    Runs blocking inference off the event loop with a bounded backlog
+    
+    Every request takes a slot for as long as it is queued or running. When
+    all `max_pending` slots are taken new requests are rejected immediately
+    with QueueFullError instead of piling up, and a request that is not done
+    within `timeout_seconds` fails with DeadlineExceededError. Work that is
+    still queued when its deadline passes is dropped without running.
+    
+    torch and onnxruntime release the GIL during forward passes, so a thread
+    pool is the default; any concurrent.futures Executor can be passed in.
+    """
+    
+    def __init__(
+        self,
+        max_workers: int = 1,
+        max_pending: int = 64,
+        timeout_seconds: float = 10.0,
+        retry_after_seconds: float = 1.0,
+        executor: Optional[Executor] = None
+    ):
+        """
+        Args:
+            max_workers: Threads in the default inference pool
+            max_pending: Maximum requests queued or running at once
+            timeout_seconds: Per-request deadline, measured from admission
+            retry_after_seconds: Hint returned to rejected clients (Retry-After)
+            executor: Pool to run inference on (defaults to a dedicated thread pool)
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout_seconds
+        self.retry_after = retry_after_seconds
+        self.pool = executor or ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._pending = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+    
+    def _admit(self) -> float:
+        """Take a slot or reject; returns the request deadline"""
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise QueueFullError(
+                f"Inference queue full ({self._pending}/{self.max_pending} pending)",
+                self.retry_after
+            )
+        self._pending += 1
+        return time.monotonic() + self.timeout
+    
+    def _release(self):
+        self._pending -= 1
+    
+    def _call_before_deadline(self, deadline: float, fn: Callable, args: tuple) -> Any:
+        """Run fn on a pool thread unless the request already expired while queued"""
+        if time.monotonic() >= deadline:
+            raise DeadlineExceededError("Request expired while queued", self.retry_after)
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+    
+    async def _wait(self, awaitable: Awaitable, deadline: float) -> Any:
+        try:
+            result = await asyncio.wait_for(awaitable, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise DeadlineExceededError(
+                f"Inference did not finish within {self.timeout:.1f}s",
+                self.retry_after
+            )
+        except DeadlineExceededError:
+            self.timed_out += 1
+            raise
+        self.completed += 1
+        return result
+    
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run a blocking function on the inference pool
+        
+        Args:
+            fn: Blocking callable (e.g. a forward pass)
+            *args: Positional arguments for fn
+        
+        Returns:
+            fn's return value
+        
+        Raises:
+            QueueFullError: No slot was free
+            DeadlineExceededError: The request did not finish before its deadline
+        """
+        deadline = self._admit()
+        try:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.pool, self._call_before_deadline, deadline, fn, args)
+            return await self._wait(future, deadline)
+        finally:
+            self._release()
+    
+    def tracked(self, batch_fn: Callable[[Sequence], Any]) -> Callable[[Sequence], Any]:
+        """
+        Wrap a batch function so the requests it serves count as running
+        
+        Work admitted through guard() is run by someone else (e.g. the
+        MicroBatcher's score_fn on this pool); wrapping that function counts
+        each item of a batch as one running request while the batch executes,
+        so `running` and `queue_depth` cover both paths.
+        """
+        def run_batch(items: Sequence) -> Any:
+            with self._lock:
+                self._running += len(items)
+            try:
+                return batch_fn(items)
+            finally:
+                with self._lock:
+                    self._running -= len(items)
+        return run_batch
+    
+    async def guard(self, awaitable: Awaitable) -> Any:
+        """
+        Apply admission control and the deadline to work scheduled elsewhere
+        (e.g. a MicroBatcher.submit() whose batches run on this pool; wrap its
+        score_fn with tracked() so running requests are counted)
+        """
+        try:
+            deadline = self._admit()
+        except QueueFullError:
+            # Don't leave the un-awaited coroutine behind
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise
+        try:
+            return await self._wait(awaitable, deadline)
+        finally:
+            self._release()
+    
+    def shutdown(self):
+        """Stop the pool without waiting for queued work"""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+    
+    def stats(self) -> dict:
+        """
+        Return queue depth and admission counters
+        
+        `pending` counts admitted requests (queued or running), `running` those
+        executing now and `queue_depth` those still waiting.
+        """
+        with self._lock:
+            running = self._running
+        return {
+            "pending": self._pending,
+            "running": running,
+            "queue_depth": max(0, self._pending - running),
+            "max_pending": self.max_pending,
+            "max_workers": self.max_workers,
+            "timeout_seconds": self.timeout,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
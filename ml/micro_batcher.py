@@ -0,0 +1,131 @@
+"""
+Dynamic micro-batching for text emotion inference
+Gathers concurrent requests into a single batched forward pass
+"""
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+class MicroBatcher:
+    """
+    Collects texts submitted from concurrent requests and scores them together
+    
+    The first queued text opens a batch; the batch is flushed once it holds
+    `max_batch_size` texts or `max_wait_ms` has elapsed. Scoring runs on an
+    executor so the event loop keeps serving other requests, and texts that
+    arrive meanwhile form the next batch.
+    """
+    
+    def __init__(
+        self,
+        score_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None
+    ):
+        """
+        Args:
+            score_fn: Maps a list of texts to an array of per-text probability rows
+                (e.g. EmotionClassifier.predict_proba)
+            max_batch_size: Maximum number of texts per forward pass
+            max_wait_ms: Maximum time to hold the first text while waiting for more
+            executor: Executor to run score_fn on (defaults to the loop's executor)
+        """
+        self.score_fn = score_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches_run = 0
+        self.texts_scored = 0
+    
+    def start(self):
+        """Start the background batching task (call from a running event loop)"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the background batching task"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    async def submit(self, text: str) -> np.ndarray:
+        """
+        Queue a text for scoring and wait for its probability row
+        
+        Args:
+            text: Input text to classify
+            
+        Returns:
+            Probability vector for this text
+        """
+        if self._worker is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for the first item, then gather more until full or timed out"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                # Still take whatever is already queued without waiting
+                if self._queue.empty():
+                    break
+                batch.append(self._queue.get_nowait())
+                continue
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        # Callers that gave up (e.g. disconnected clients) don't need scoring
+        return [(text, future) for text, future in batch if not future.done()]
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            
+            texts = [text for text, _ in batch]
+            try:
+                probs = await loop.run_in_executor(self.executor, self.score_fn, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            self.batches_run += 1
+            self.texts_scored += len(texts)
+            for (_, future), row in zip(batch, probs):
+                if not future.done():
+                    future.set_result(row)
+    
+    def stats(self) -> dict:
+        """Return batching counters"""
+        return {
+            "batches_run": self.batches_run,
+            "texts_scored": self.texts_scored,
+            "avg_batch_size": (self.texts_scored / self.batches_run) if self.batches_run else 0.0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0
+        }
@@ -0,0 +1,112 @@
+"""
+Prediction cache for the text emotion API
+Bounded LRU cache of probability vectors keyed by normalized text and model version
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# A run of the same punctuation character ("!!!", "...", "??")
+_REPEATED_PUNCTUATION_RE = re.compile(r"([^\w\s])\1+")
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for cache lookup
+    
+    Lowercases (the tokenizer is uncased), trims and collapses whitespace, and
+    collapses repeated punctuation, so "I'm fine!!!" and "  i'm   fine! " share
+    one entry.
+    """
+    text = _WHITESPACE_RE.sub(" ", text.lower()).strip()
+    return _REPEATED_PUNCTUATION_RE.sub(r"\1", text)
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of class probability vectors
+    
+    One probability vector is stored per (normalized text, model version), so
+    requests with different top_k are all answered from the same entry.
+    """
+    
+    def __init__(self, max_size: int = 10000, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            max_size: Maximum number of cached entries (least recently used are evicted)
+            ttl_seconds: Optional time-to-live for entries; None keeps them until evicted
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, normalized_text: str, model_version: str) -> Optional[np.ndarray]:
+        """
+        Look up the probability vector for a normalized text
+        
+        Returns:
+            Cached probabilities, or None on a miss or expired entry
+        """
+        key = (normalized_text, model_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            stored_at, probs = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return probs
+    
+    def put(self, normalized_text: str, model_version: str, probs: np.ndarray):
+        """Store the probability vector for a normalized text"""
+        if self.max_size <= 0:
+            return
+        
+        # Entries are shared between requests, so make them read-only
+        probs = np.array(probs, copy=True)
+        probs.setflags(write=False)
+        
+        key = (normalized_text, model_version)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), probs)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Remove all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, float]:
+        """Return cache size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
@@ -0,0 +1,55 @@
+"""
+Compare the fp32 and INT8 quantized text models on the GoEmotions test split
+"""
+import os
+import sys
+import json
+import argparse
+
+from inference import EmotionClassifier
+from evaluate_model import load_and_prepare_test_data, benchmark_classifier, weights_size_mb
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy/latency/size report for fp32 vs INT8")
+    parser.add_argument("--fp32-path", default="checkpoints/best_model", help="fp32 model directory")
+    parser.add_argument("--int8-path", default="checkpoints/best_model_int8", help="INT8 artifact directory")
+    parser.add_argument("--latency-samples", type=int, default=500, help="Messages to time one at a time")
+    parser.add_argument("--output", default="checkpoints/quantization_report.json", help="Report output path")
+    args = parser.parse_args()
+    
+    for path, hint in [(args.fp32_path, "python train_model.py"), (args.int8_path, "python quantize_model.py")]:
+        if not os.path.exists(path):
+            print(f"Error: Model not found at {path}")
+            print(f"Create it first using: {hint}")
+            sys.exit(1)
+    
+    X_test, y_test, _, _ = load_and_prepare_test_data()
+    print(f"Benchmarking on {len(X_test)} test examples...")
+    
+    report = {}
+    for name, path in [("fp32", args.fp32_path), ("int8", args.int8_path)]:
+        print(f"\n[{name}] Loading {path}...")
+        classifier = EmotionClassifier(path)
+        results = benchmark_classifier(classifier, X_test, y_test, args.latency_samples)
+        results["model_size_mb"] = weights_size_mb(classifier.model_path)
+        report[name] = results
+    
+    print("\n=== fp32 vs INT8 ===")
+    print(f"{'metric':<18}{'fp32':>12}{'int8':>12}")
+    for metric in ["accuracy", "f1_macro", "latency_p50_ms", "latency_p99_ms", "model_size_mb"]:
+        print(f"{metric:<18}{report['fp32'][metric]:>12.4f}{report['int8'][metric]:>12.4f}")
+    
+    report["delta"] = {
+        "accuracy": report["int8"]["accuracy"] - report["fp32"]["accuracy"],
+        "f1_macro": report["int8"]["f1_macro"] - report["fp32"]["f1_macro"],
+        "latency_p50_speedup": report["fp32"]["latency_p50_ms"] / max(report["int8"]["latency_p50_ms"], 1e-9),
+        "size_ratio": report["int8"]["model_size_mb"] / max(report["fp32"]["model_size_mb"], 1e-9)
+    }
+    
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Create a dynamically quantized INT8 variant of the text emotion model
+"""
+import os
+import sys
+import argparse
+
+import torch
+from transformers import DistilBertTokenizer, DistilBertForSequenceClassification
+
+from inference import QUANTIZED_WEIGHTS_FILENAME
+
+def quantize_model(model_path: str = "checkpoints/best_model", output_dir: str = "checkpoints/best_model_int8") -> bool:
+    """
+    Quantize all Linear layers of the fp32 model to INT8 and save the result
+    
+    The artifact directory holds the model config, the tokenizer and the
+    quantized state dict, so it can be passed to EmotionClassifier directly.
+    
+    Args:
+        model_path: Directory containing the fp32 fine-tuned model
+        output_dir: Directory to write the INT8 artifact to
+        
+    Returns:
+        True if quantization succeeded
+    """
+    print("=" * 70)
+    print("Quantizing Text Emotion Model to INT8")
+    print("=" * 70)
+    
+    if not os.path.exists(model_path):
+        print(f"ERROR: Model not found at {model_path}")
+        print("Please train the model first using: python train_model.py")
+        return False
+    
+    try:
+        print(f"[INFO] Loading fp32 model from {model_path}...")
+        tokenizer = DistilBertTokenizer.from_pretrained(model_path)
+        model = DistilBertForSequenceClassification.from_pretrained(model_path)
+        model.eval()
+        
+        print("[INFO] Applying dynamic INT8 quantization to Linear layers...")
+        quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        
+        os.makedirs(output_dir, exist_ok=True)
+        model.config.save_pretrained(output_dir)
+        tokenizer.save_pretrained(output_dir)
+        weights_path = os.path.join(output_dir, QUANTIZED_WEIGHTS_FILENAME)
+        torch.save(quantized.state_dict(), weights_path)
+        
+        size = os.path.getsize(weights_path) / (1024 * 1024)
+        print(f"[OK] INT8 model saved to {output_dir}/ ({size:.1f} MB)")
+        print("Compare it against fp32 with: python quantization_report.py")
+        return True
+    except Exception as e:
+        print(f"ERROR: Quantization failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create an INT8 quantized text emotion model")
+    parser.add_argument("--model-path", default="checkpoints/best_model", help="fp32 model directory")
+    parser.add_argument("--output-dir", default="checkpoints/best_model_int8", help="INT8 artifact directory")
+    args = parser.parse_args()
+    
+    success = quantize_model(args.model_path, args.output_dir)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,206 @@
+"""
+Bulk offline scoring of chat logs with the text emotion model
+Streams a JSONL or CSV file, shards it across worker processes (each with its
+own batched EmotionClassifier), writes results incrementally and can resume
+an interrupted run
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import multiprocessing as mp
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+# Per-process classifier, created by _init_worker
+_classifier = None
+_top_k = 3
+
+def _init_worker(model_path: str, backend: str, top_k: int, num_threads: int):
+    """Load one classifier per worker process"""
+    global _classifier, _top_k
+    import torch
+    torch.set_num_threads(num_threads)
+    from inference import EmotionClassifier
+    _classifier = EmotionClassifier(model_path, backend=backend)
+    _top_k = top_k
+
+def _score_chunk(texts: List[str]) -> List[List[Dict[str, float]]]:
+    """Score one chunk of texts with this worker's classifier"""
+    return _classifier.predict_batch(texts, top_k=_top_k)
+
+def read_rows(path: str, input_format: str) -> Iterator[Dict]:
+    """Stream rows from a JSONL or CSV file"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if input_format == "csv":
+            for row in csv.DictReader(f):
+                yield row
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+def chunked(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def load_checkpoint(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, state: Dict):
+    """Write the checkpoint atomically so a crash never leaves it half-written"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def score_corpus(
+    input_path: str,
+    output_path: str,
+    text_field: str = "text",
+    input_format: Optional[str] = None,
+    model_path: str = "checkpoints/best_model",
+    backend: str = "torch",
+    workers: int = 1,
+    chunk_size: int = 256,
+    top_k: int = 3,
+    resume: bool = True,
+    report_every: int = 10000
+) -> Dict[str, float]:
+    """
+    Score every row of a corpus and append the predictions to a JSONL output file
+    
+    Each output line is the input row plus 'predictions', 'top_emotion' and
+    'top_confidence'. Progress (rows done and output size) is checkpointed
+    after every chunk; a resumed run truncates the output to the last
+    checkpoint and skips the rows already scored.
+    
+    Returns:
+        Dictionary with rows scored in this run, elapsed seconds and rows/sec
+    """
+    input_format = input_format or ("csv" if input_path.lower().endswith(".csv") else "jsonl")
+    checkpoint_path = output_path + ".progress.json"
+    
+    rows_done = 0
+    state = load_checkpoint(checkpoint_path) if resume else None
+    if state and state.get("input") == os.path.abspath(input_path) and os.path.exists(output_path):
+        rows_done = state["rows_done"]
+        # Drop anything written after the last checkpoint
+        with open(output_path, "r+b") as f:
+            f.truncate(state["output_bytes"])
+        print(f"Resuming after {rows_done} rows")
+    else:
+        open(output_path, "w").close()
+    
+    rows = read_rows(input_path, input_format)
+    for _ in islice(rows, rows_done):
+        pass
+    chunks = chunked(rows, chunk_size)
+    
+    num_threads = max(1, (os.cpu_count() or 1) // max(workers, 1))
+    init_args = (model_path, backend, top_k, num_threads)
+    pool = None
+    if workers > 0:
+        # spawn: every worker builds its own torch runtime and classifier
+        pool = mp.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=init_args)
+    else:
+        _init_worker(*init_args)
+    
+    start = time.perf_counter()
+    scored = 0
+    next_report = report_every
+    # Keep a bounded number of chunks in flight and write them back in input order
+    in_flight = deque()
+    max_in_flight = max(1, workers) * 2
+    
+    def write_chunk(out, chunk: List[Dict], predictions: List[List[Dict[str, float]]]):
+        nonlocal rows_done, scored, next_report
+        for row, preds in zip(chunk, predictions):
+            row = dict(row)
+            row["predictions"] = preds
+            row["top_emotion"] = preds[0]["emotion"] if preds else None
+            row["top_confidence"] = preds[0]["confidence"] if preds else None
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        out.flush()
+        rows_done += len(chunk)
+        scored += len(chunk)
+        save_checkpoint(checkpoint_path, {
+            "input": os.path.abspath(input_path),
+            "rows_done": rows_done,
+            "output_bytes": out.tell()
+        })
+        if scored >= next_report:
+            elapsed = time.perf_counter() - start
+            print(f"{rows_done} rows done ({scored / elapsed:.1f} rows/sec)")
+            next_report += report_every
+    
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            for chunk in chunks:
+                texts = [str(row.get(text_field) or "") for row in chunk]
+                if pool is None:
+                    write_chunk(out, chunk, _score_chunk(texts))
+                    continue
+                in_flight.append((chunk, pool.apply_async(_score_chunk, (texts,))))
+                if len(in_flight) >= max_in_flight:
+                    done_chunk, result = in_flight.popleft()
+                    write_chunk(out, done_chunk, result.get())
+            while in_flight:
+                done_chunk, result = in_flight.popleft()
+                write_chunk(out, done_chunk, result.get())
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    
+    elapsed = time.perf_counter() - start
+    rate = scored / elapsed if elapsed > 0 else 0.0
+    print(f"\nScored {scored} rows in {elapsed:.1f}s ({rate:.1f} rows/sec), {rows_done} total")
+    print(f"Results written to {output_path}")
+    return {"rows_scored": scored, "rows_done": rows_done, "seconds": elapsed, "rows_per_sec": rate}
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a JSONL/CSV corpus with the text emotion model")
+    parser.add_argument("input", help="Input .jsonl or .csv file")
+    parser.add_argument("output", help="Output .jsonl file")
+    parser.add_argument("--text-field", default="text", help="Field/column holding the text")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="Input format (default: by extension)")
+    parser.add_argument("--model-path", default="checkpoints/best_model", help="Model directory")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch", help="Inference backend")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Worker processes (0 scores in-process)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Rows per worker task")
+    parser.add_argument("--top-k", type=int, default=3, help="Emotions to keep per row")
+    parser.add_argument("--no-resume", action="store_true", help="Start over instead of resuming")
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.input):
+        print(f"Error: Input not found at {args.input}")
+        sys.exit(1)
+    
+    score_corpus(
+        args.input,
+        args.output,
+        text_field=args.text_field,
+        input_format=args.format,
+        model_path=args.model_path,
+        backend=args.backend,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        top_k=args.top_k,
+        resume=not args.no_resume
+    )
+
+if __name__ == "__main__":
+    main()
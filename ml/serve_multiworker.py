@@ -0,0 +1,104 @@
+"""
+Pre-fork multi-worker serving for the text emotion API
+The model is loaded once in the parent process; forked workers share its
+weight pages copy-on-write instead of each loading a private copy
+"""
+
+import os
+import sys
+import gc
+import signal
+import socket
+import argparse
+
+def _process_threads(workers: int) -> int:
+    """Intra-op threads per worker so that all workers together use every core once"""
+    return max(1, (os.cpu_count() or 1) // max(workers, 1))
+
+def run_worker(sock: socket.socket, threads: int, log_level: str):
+    """Configure torch threading, warm up and serve on the inherited socket"""
+    import torch
+    import uvicorn
+    import api_server
+    
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set once per process; keep the inherited value
+        pass
+    
+    # Warm-up runs in each worker so no forward pass (and no OpenMP pool)
+    # ever runs in the parent before fork
+    if api_server.classifier is not None:
+        seconds = api_server.classifier.warmup()
+        api_server.model_status["phases"]["warmup_seconds"] = seconds
+    
+    print(f"[worker {os.getpid()}] serving with {threads} torch threads")
+    config = uvicorn.Config(api_server.app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the text emotion API from pre-forked workers")
+    parser.add_argument("--host", default="0.0.0.0", help="Bind address")
+    parser.add_argument("--port", type=int, default=8000, help="Bind port")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Worker processes")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="torch intra-op threads per worker (default: cores // workers)")
+    parser.add_argument("--log-level", default="info", help="uvicorn log level")
+    args = parser.parse_args()
+    
+    if not hasattr(os, "fork"):
+        print("ERROR: Pre-fork serving needs os.fork (Linux/macOS).")
+        print("On Windows run a single process instead: python api_server.py")
+        sys.exit(1)
+    
+    threads = args.threads_per_worker or _process_threads(args.workers)
+    
+    # Load the weights once, before forking. Warm-up is deferred to the workers.
+    import api_server
+    api_server.load_model(warmup=False)
+    if api_server.classifier is None:
+        print("WARNING: Model not loaded; workers will serve mock responses")
+    
+    # Move everything allocated so far out of the garbage collector's reach, so
+    # collections in the workers don't write to (and un-share) the parent's pages
+    gc.collect()
+    gc.freeze()
+    
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    print(f"Listening on {args.host}:{args.port} with {args.workers} workers x {threads} threads")
+    
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, threads, args.log_level)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    
+    def shutdown(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+
+if __name__ == "__main__":
+    main()
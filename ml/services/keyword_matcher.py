@@ -0,0 +1,214 @@
+"""
+Multi-keyword matcher (Aho-Corasick over word tokens)
+Finds every keyword of a large list in a single pass over the text
+"""
+
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+# (start, end, keyword, label); start/end are character offsets into the text
+KeywordMatch = Tuple[int, int, str, str]
+
+# Words (keeping contractions like "can't" whole) and single punctuation marks
+TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)*|[^\w\s]")
+# Word characters only, splitting at apostrophes ("suicide's" -> suicide ' s),
+# the same word boundaries as a \b regex
+WORD_PART_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def _lower(text: str) -> str:
+    """Lowercase without changing the length, so offsets stay valid"""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters lowercase to several; keep those as-is
+        lowered = ''.join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+    return lowered
+
+def tokenize(text: str, pattern: re.Pattern = TOKEN_PATTERN) -> List[str]:
+    """Lowercased word/punctuation tokens, the alphabet the matcher runs on"""
+    return pattern.findall(_lower(text))
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a fixed set of labelled keywords
+    
+    Text and keywords are split into word tokens and the automaton runs over
+    token sequences, so matching costs one pass over the text no matter how
+    many keywords there are, and keywords only ever match whole words:
+    'love' matches "I LOVE it" but not "lovely" or "glove". Multi-word
+    keywords match across any whitespace ("fed up" matches "fed\\n up").
+    """
+    
+    def __init__(self, keywords: Iterable[Tuple[str, str]], token_pattern: re.Pattern = TOKEN_PATTERN):
+        """
+        Args:
+            keywords: (keyword, label) pairs; a keyword may carry several labels
+            token_pattern: How text and keywords split into tokens. TOKEN_PATTERN
+                keeps contractions whole ("love" does not match "love's");
+                WORD_PART_PATTERN splits at apostrophes so "suicide" matches
+                "suicide's"
+        """
+        self.token_pattern = token_pattern
+        # Trie transitions, failure links and per-state outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, int]]] = [[]]
+        self.num_keywords = 0
+        self.max_tokens = 0
+        
+        for keyword, label in keywords:
+            tokens = tokenize(keyword, token_pattern)
+            if tokens:
+                self._add(tokens, ' '.join(keyword.lower().split()), label)
+        self._build_failure_links()
+    
+    @classmethod
+    def from_groups(cls, groups: Dict[str, Iterable[str]], token_pattern: re.Pattern = TOKEN_PATTERN) -> 'KeywordMatcher':
+        """Build from {label: [keywords]} (e.g. TONE_KEYWORDS)"""
+        return cls(((keyword, label) for label, keywords in groups.items() for keyword in keywords), token_pattern)
+    
+    def _add(self, tokens: List[str], keyword: str, label: str):
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][token] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((keyword, label, len(tokens)))
+        self.num_keywords += 1
+        self.max_tokens = max(self.max_tokens, len(tokens))
+    
+    def _build_failure_links(self):
+        """Breadth-first: each state's failure link is its longest proper suffix in the trie"""
+        # Depth-1 states fail back to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(token, 0)
+                # A state also emits everything its suffix state emits
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+    
+    def stream(self) -> 'KeywordStream':
+        """Start an incremental scan (see KeywordStream)"""
+        return KeywordStream(self)
+    
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """
+        Find every keyword occurrence in one pass
+        
+        Args:
+            text: Input text
+        
+        Returns:
+            List of (start, end, keyword, label) in order of match end;
+            overlapping matches are all reported
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        tokens = list(self.token_pattern.finditer(_lower(text)))
+        matches = []
+        state = 0
+        
+        for i, token in enumerate(tokens):
+            word = token.group()
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for keyword, label, length in out[state]:
+                matches.append((tokens[i - length + 1].start(), token.end(), keyword, label))
+        return matches
+    
+    def labels(self, text: str) -> Set[str]:
+        """Set of labels with at least one keyword in the text (skips span bookkeeping)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        root = goto[0]
+        found = set()
+        state = 0
+        
+        for word in tokenize(text, self.token_pattern):
+            if state:
+                while state and word not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(word, 0)
+            else:
+                # Most words of a message start no keyword at all
+                state = root.get(word, 0)
+                if not state:
+                    continue
+            for _, label, _ in out[state]:
+                found.add(label)
+        return found
+
+class KeywordStream:
+    """
+    Incremental KeywordMatcher scan over text that arrives in chunks
+    
+    The automaton state is carried from one chunk to the next, so a keyword
+    split across chunks ("want to" + " die") is still found and no text is
+    scanned twice. A trailing partial word is held back until the next chunk
+    shows whether it continues ("di" + "e" vs. "die" + "t"); flush() releases
+    it at the end of the input.
+    """
+    
+    # Hold back at most this much unbroken text before scanning it anyway
+    MAX_TAIL = 1024
+    
+    def __init__(self, matcher: KeywordMatcher):
+        self.matcher = matcher
+        self.state = 0
+        self.consumed = 0  # characters scanned so far (excluding the held-back tail)
+        self._tail = ''
+        # Start offsets of the most recent tokens, enough to place any keyword's start
+        self._token_starts = deque(maxlen=max(1, matcher.max_tokens))
+    
+    def feed(self, chunk: str) -> List[KeywordMatch]:
+        """
+        Scan the next chunk of text
+        
+        Returns:
+            Keywords completed by this chunk, as (start, end, keyword, label)
+            with offsets counted from the start of the stream
+        """
+        text = self._tail + chunk
+        # A token never spans whitespace, so only the trailing non-whitespace
+        # run can still grow with the next chunk
+        cut = len(text)
+        while cut and not text[cut - 1].isspace():
+            cut -= 1
+        if len(text) - cut > self.MAX_TAIL:
+            cut = len(text)
+        self._tail = text[cut:]
+        return self._scan(text[:cut])
+    
+    def flush(self) -> List[KeywordMatch]:
+        """Scan the held-back tail (end of input or message boundary)"""
+        text, self._tail = self._tail, ''
+        return self._scan(text)
+    
+    def _scan(self, text: str) -> List[KeywordMatch]:
+        goto, fail, out = self.matcher._goto, self.matcher._fail, self.matcher._out
+        token_starts = self._token_starts
+        base = self.consumed
+        matches = []
+        state = self.state
+        
+        for token in self.matcher.token_pattern.finditer(_lower(text)):
+            word = token.group()
+            token_starts.append(base + token.start())
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for keyword, label, length in out[state]:
+                matches.append((token_starts[-length], base + token.end(), keyword, label))
+        
+        self.state = state
+        self.consumed += len(text)
+        return matches
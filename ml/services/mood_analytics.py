@@ -0,0 +1,302 @@
+"""
+Mood analytics over long histories
+Trends, frequencies, streaks, weekday patterns and change points computed
+with NumPy array operations on the normalized emotion categories
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.suggestions import EMOTION_CATEGORIES, normalize_emotion
+from services.mood_store import CATEGORY_CODES, NEGATIVE_EMOTIONS
+
+# Mood score per category on the Dashboard's 1 (low) - 5 (very positive) scale
+MOOD_SCORES = {
+    'happy': 5.0,
+    'neutral': 3.0,
+    'anxious': 2.0,
+    'stressed': 2.0,
+    'low_energy': 2.0,
+    'fear': 1.0,
+    'sad': 1.0,
+    'angry': 1.0,
+}
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+SECONDS_PER_DAY = 86400
+
+# Accepted entry times: from 2000-01-01 to a day ahead of the server clock
+# (millisecond timestamps and the like fall outside)
+MIN_TIMESTAMP = 946684800.0
+MAX_FUTURE_SECONDS = SECONDS_PER_DAY
+# Longest span analyzed; older entries are left out (about ten years)
+MAX_DAYS = 3660
+
+SCORE_TABLE = np.array([MOOD_SCORES[category] for category in EMOTION_CATEGORIES])
+NEGATIVE_TABLE = np.array([category in NEGATIVE_EMOTIONS for category in EMOTION_CATEGORIES])
+
+def timestamp_in_range(timestamp: float, now: Optional[float] = None) -> bool:
+    """Whether a Unix-seconds entry time is plausible (False for NaN)"""
+    now = time.time() if now is None else now
+    return MIN_TIMESTAMP <= timestamp <= now + MAX_FUTURE_SECONDS
+
+def encode_emotions(emotions: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    Category codes (indices into EMOTION_CATEGORIES) for emotion labels
+    
+    Each distinct label is normalized once, however often it repeats.
+    """
+    lookup = {emotion: CATEGORY_CODES[normalize_emotion(emotion or 'neutral')] for emotion in set(emotions)}
+    return np.fromiter(map(lookup.__getitem__, emotions), dtype=np.int8, count=len(emotions))
+
+def encode_entries(entries: Sequence[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Arrays for mood_analytics from mood entries
+    
+    Args:
+        entries: Dictionaries with 'emotion' and 'timestamp' (Unix seconds)
+    
+    Returns:
+        Tuple of (timestamps as float64, category codes as int8)
+    """
+    timestamps = np.fromiter((entry['timestamp'] for entry in entries), dtype=np.float64, count=len(entries))
+    return timestamps, encode_emotions([entry.get('emotion') for entry in entries])
+
+def encode_timeline(rows: Sequence[Tuple[float, str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Arrays for mood_analytics from (timestamp, emotion) rows (stored histories: MoodStore.timeline_arrays)"""
+    if not rows:
+        return np.zeros(0), np.zeros(0, dtype=np.int8)
+    timestamps, emotions = zip(*rows)
+    return np.array(timestamps, dtype=np.float64), encode_emotions(emotions)
+
+def _rounded(values: np.ndarray, digits: int = 3) -> List[Optional[float]]:
+    """JSON-ready list with NaN as None"""
+    return [None if value != value else value for value in np.round(values, digits).tolist()]
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Elementwise division with NaN where the denominator is zero"""
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+def _runs(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start indices and lengths of runs of equal consecutive values (non-empty input)"""
+    change = np.empty(len(values), dtype=bool)
+    change[0] = True
+    np.not_equal(values[1:], values[:-1], out=change[1:])
+    starts = np.flatnonzero(change)
+    lengths = np.empty_like(starts)
+    lengths[:-1] = starts[1:] - starts[:-1]
+    lengths[-1] = len(values) - starts[-1]
+    return starts, lengths
+
+def _change_points(
+    day_sums: np.ndarray,
+    day_counts: np.ndarray,
+    window: int,
+    threshold: float,
+    min_entries: int,
+    max_points: int
+) -> List[Tuple[int, float, float]]:
+    """
+    Days where the mean mood score shifts
+    
+    Compares the mean score of the `window` days before each day with the
+    `window` days from it on; a day is a change point when the shift is at
+    least `threshold` and the largest within `window` days either side.
+    
+    Returns:
+        (day offset, mean before, mean after) for up to max_points points,
+        in chronological order
+    """
+    num_days = len(day_counts)
+    if num_days < 2 * window:
+        return []
+    score_cumsum = np.concatenate(([0.0], np.cumsum(day_sums)))
+    count_cumsum = np.concatenate(([0], np.cumsum(day_counts)))
+    
+    days = np.arange(window, num_days - window + 1)
+    before_counts = count_cumsum[days] - count_cumsum[days - window]
+    after_counts = count_cumsum[days + window] - count_cumsum[days]
+    before = _safe_divide(score_cumsum[days] - score_cumsum[days - window], before_counts)
+    after = _safe_divide(score_cumsum[days + window] - score_cumsum[days], after_counts)
+    
+    shift = np.abs(after - before)
+    shift[(before_counts < min_entries) | (after_counts < min_entries) | np.isnan(shift)] = 0.0
+    
+    # Keep only the strongest shift in each neighbourhood
+    padded = np.pad(shift, window, constant_values=0.0)
+    neighbourhood_max = np.lib.stride_tricks.sliding_window_view(padded, 2 * window + 1).max(axis=1)
+    candidates = np.flatnonzero((shift >= threshold) & (shift == neighbourhood_max))
+    # A flat run of equal maxima would report every day; keep its first
+    if len(candidates) > 1:
+        candidates = candidates[np.concatenate(([True], np.diff(candidates) > window))]
+    strongest = candidates[np.argsort(-shift[candidates], kind='stable')[:max_points]]
+    strongest.sort()
+    return [(int(days[i]), float(before[i]), float(after[i])) for i in strongest]
+
+def mood_analytics(
+    timestamps: np.ndarray,
+    codes: np.ndarray,
+    window: int = 7,
+    tz_offset_minutes: int = 0,
+    change_threshold: float = 1.0,
+    change_min_entries: int = 3,
+    max_change_points: int = 5,
+    max_days: int = MAX_DAYS
+) -> Dict[str, Any]:
+    """
+    Analyze a mood history
+    
+    Args:
+        timestamps: Entry times in Unix seconds
+        codes: Category codes from encode_emotions (same length)
+        window: Rolling window in days (daily trend and change points);
+            also the number of latest entries in recent_mean
+        tz_offset_minutes: Client's UTC offset, so days and weekdays are local
+        change_threshold: Minimum shift in mean mood score for a change point
+        change_min_entries: Entries needed on each side of a change point
+        max_change_points: Most change points to report (strongest first)
+        max_days: Only the entries of the last `max_days` days (counted back
+            from the latest entry) are analyzed, which bounds the per-day
+            arrays whatever the timestamps
+    
+    Returns:
+        Dictionary with:
+        - entries, first_timestamp, last_timestamp (of the analyzed entries)
+        - excluded_entries: Entries older than `max_days` that were left out
+        - frequencies: {category: {'count', 'share'}}
+        - mood_score: 'mean' over all entries and 'recent_mean' over the last `window`
+        - daily: 'dates', 'counts', 'mean_score' and the `window`-day
+          'rolling_mean' per calendar day (None on days without entries)
+        - streaks: 'current' emotion and length, 'longest' run per category,
+          'current_negative' and 'longest_negative' runs of negative emotions
+        - day_of_week: count, mean score and dominant emotion per weekday
+        - change_points: 'date', 'before', 'after' and 'shift' in mean score
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.int8)
+    n = len(codes)
+    num_categories = len(EMOTION_CATEGORIES)
+    if n == 0:
+        return {
+            'entries': 0,
+            'excluded_entries': 0,
+            'first_timestamp': None,
+            'last_timestamp': None,
+            'frequencies': {category: {'count': 0, 'share': 0.0} for category in EMOTION_CATEGORIES},
+            'mood_score': {'mean': None, 'recent_mean': None},
+            'daily': {'dates': [], 'counts': [], 'mean_score': [], 'rolling_mean': []},
+            'streaks': {'current': None, 'longest': {category: 0 for category in EMOTION_CATEGORIES},
+                        'current_negative': 0, 'longest_negative': 0},
+            'day_of_week': [{'day': day, 'count': 0, 'mean_score': None, 'dominant_emotion': None} for day in WEEKDAYS],
+            'change_points': [],
+        }
+    
+    # Entries usually arrive in time order; only sort when they don't
+    if np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, codes = timestamps[order], codes[order]
+    
+    excluded = int(np.searchsorted(timestamps, timestamps[-1] - max_days * SECONDS_PER_DAY, side='left'))
+    if excluded:
+        timestamps, codes = timestamps[excluded:], codes[excluded:]
+        n = len(codes)
+    
+    # Calendar days (local time) from the first entry's day. Entries are
+    # sorted, so each day is a contiguous slice found by binary search on the
+    # day boundaries instead of dividing every timestamp
+    offset = tz_offset_minutes * 60
+    first_day = int((timestamps[0] + offset) // SECONDS_PER_DAY)
+    num_days = int((timestamps[-1] + offset) // SECONDS_PER_DAY) - first_day + 1
+    boundaries = (first_day + np.arange(num_days + 1)) * SECONDS_PER_DAY - offset
+    day_counts = np.diff(np.searchsorted(timestamps, boundaries, side='left'))
+    # Entries per (day, category): the one pass over all entries that the
+    # frequencies, daily scores and weekday patterns are all derived from
+    day_offsets = np.repeat(np.arange(num_days) * num_categories, day_counts)
+    day_emotions = np.bincount(day_offsets + codes, minlength=num_days * num_categories).reshape(num_days, num_categories)
+    day_sums = day_emotions @ SCORE_TABLE
+    
+    # Frequencies
+    counts = day_emotions.sum(axis=0)
+    frequencies = {
+        category: {'count': int(counts[i]), 'share': round(float(counts[i]) / n, 4)}
+        for i, category in enumerate(EMOTION_CATEGORIES)
+    }
+    
+    score_cumsum = np.concatenate(([0.0], np.cumsum(day_sums)))
+    count_cumsum = np.concatenate(([0], np.cumsum(day_counts)))
+    ends = np.arange(1, num_days + 1)
+    starts = np.maximum(ends - window, 0)
+    rolling_mean = _safe_divide(score_cumsum[ends] - score_cumsum[starts], count_cumsum[ends] - count_cumsum[starts])
+    dates = np.arange(first_day, first_day + num_days).astype('datetime64[D]').astype(str).tolist()
+    
+    # Streaks: runs of the same category, then runs of negative emotions as
+    # runs of negative category runs (a much shorter array than the entries)
+    run_starts, run_lengths = _runs(codes)
+    run_codes = codes[run_starts].astype(np.intp)
+    longest_runs = np.zeros(num_categories, dtype=np.int64)
+    np.maximum.at(longest_runs, run_codes, run_lengths)
+    longest = {category: int(longest_runs[i]) for i, category in enumerate(EMOTION_CATEGORIES)}
+    negative = NEGATIVE_TABLE[run_codes]
+    negative_starts, _ = _runs(negative)
+    negative_lengths = np.diff(np.append(run_starts[negative_starts], n))[negative[negative_starts]]
+    longest_negative = int(negative_lengths.max()) if len(negative_lengths) else 0
+    current_negative = int(negative_lengths[-1]) if negative[-1] else 0
+    
+    # Day of week (1970-01-01 was a Thursday), aggregated from the per-day totals
+    day_weekdays = (first_day + np.arange(num_days) + 3) % 7
+    weekday_counts = np.bincount(day_weekdays, weights=day_counts, minlength=7).astype(np.int64)
+    weekday_means = _safe_divide(np.bincount(day_weekdays, weights=day_sums, minlength=7), weekday_counts)
+    weekday_emotions = np.zeros((7, num_categories), dtype=np.int64)
+    np.add.at(weekday_emotions, day_weekdays, day_emotions)
+    dominant = weekday_emotions.argmax(axis=1)
+    weekday_mean_list = _rounded(weekday_means)
+    
+    change_points = _change_points(
+        day_sums, day_counts, window, change_threshold, change_min_entries, max_change_points
+    )
+    
+    return {
+        'entries': n,
+        'excluded_entries': excluded,
+        'first_timestamp': float(timestamps[0]),
+        'last_timestamp': float(timestamps[-1]),
+        'frequencies': frequencies,
+        'mood_score': {
+            'mean': round(float(counts @ SCORE_TABLE) / n, 3),
+            'recent_mean': round(float(SCORE_TABLE[codes[-window:]].mean()), 3),
+        },
+        'daily': {
+            'dates': dates,
+            'counts': day_counts.tolist(),
+            'mean_score': _rounded(_safe_divide(day_sums, day_counts)),
+            'rolling_mean': _rounded(rolling_mean),
+        },
+        'streaks': {
+            'current': {'emotion': EMOTION_CATEGORIES[run_codes[-1]], 'length': int(run_lengths[-1])},
+            'longest': longest,
+            'current_negative': current_negative,
+            'longest_negative': longest_negative,
+        },
+        'day_of_week': [
+            {
+                'day': day,
+                'count': int(weekday_counts[i]),
+                'mean_score': weekday_mean_list[i],
+                'dominant_emotion': EMOTION_CATEGORIES[dominant[i]] if weekday_counts[i] else None,
+            }
+            for i, day in enumerate(WEEKDAYS)
+        ],
+        'change_points': [
+            {
+                'date': dates[day],
+                'before': round(before, 3),
+                'after': round(after, 3),
+                'shift': round(after - before, 3),
+            }
+            for day, before, after in change_points
+        ],
+    }
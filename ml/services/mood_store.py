@@ -0,0 +1,371 @@
+"""
+Server-side mood history store
+Persists mood entries per user (or session) in SQLite and keeps rolling
+aggregates of the recent window up to date on every insert
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.suggestions import EMOTION_CATEGORIES, normalize_emotion
+
+# Entries the routine and suggestion rules look back over
+MOOD_WINDOW = 7
+NEGATIVE_EMOTIONS = ('sad', 'angry', 'anxious', 'fear', 'stressed')
+LOW_ENERGY_EMOTION = 'low_energy'
+# Small integer code stored with each entry (index into EMOTION_CATEGORIES),
+# so histories load straight into arrays (see timeline_arrays)
+CATEGORY_CODES = {category: i for i, category in enumerate(EMOTION_CATEGORIES)}
+TIMELINE_DTYPE = np.dtype([('timestamp', np.float64), ('code', np.int8)])
+# Users whose encoded history is kept in memory (least recently used are dropped)
+MAX_CACHED_TIMELINES = 64
+
+# User data stays out of the source tree: by default under the XDG data
+# directory (or EMOTION_DATA_DIR). MOOD_STORE_PATH overrides the file;
+# ":memory:" keeps the store in the process (lost on restart)
+DATA_DIR = os.environ.get('EMOTION_DATA_DIR') or os.path.join(
+    os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share'), 'emotion-api'
+)
+DEFAULT_MOOD_STORE_PATH = os.path.join(DATA_DIR, 'mood_store.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mood_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    emotion TEXT NOT NULL,
+    code INTEGER,
+    raw_emotion TEXT,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS mood_entries_user ON mood_entries (user_id, id);
+CREATE TABLE IF NOT EXISTS mood_aggregates (
+    user_id TEXT PRIMARY KEY,
+    entries INTEGER NOT NULL,
+    recent TEXT NOT NULL,
+    negative_count INTEGER NOT NULL,
+    low_energy_count INTEGER NOT NULL,
+    streak_emotion TEXT,
+    streak_length INTEGER NOT NULL,
+    negative_streak INTEGER NOT NULL,
+    first_timestamp REAL,
+    last_timestamp REAL
+);
+"""
+
+SUMMARY_COLUMNS = (
+    'entries', 'recent', 'negative_count', 'low_energy_count', 'streak_emotion',
+    'streak_length', 'negative_streak', 'first_timestamp', 'last_timestamp'
+)
+
+def empty_summary() -> Dict[str, Any]:
+    """Summary of a user with no entries"""
+    return {
+        'entries': 0,
+        'recent': [],
+        'negative_count': 0,
+        'low_energy_count': 0,
+        'streak_emotion': None,
+        'streak_length': 0,
+        'negative_streak': 0,
+        'first_timestamp': None,
+        'last_timestamp': None,
+    }
+
+def update_summary(summary: Dict[str, Any], emotion: str, timestamp: float) -> Dict[str, Any]:
+    """
+    Fold one entry into a mood summary
+    
+    Constant work per entry: the window counts are adjusted for the entry
+    that enters and the one that drops out, and streaks extend or reset.
+    
+    Args:
+        summary: Current summary (see empty_summary); not modified
+        emotion: Normalized emotion of the new entry
+        timestamp: Entry time (Unix seconds)
+    
+    Returns:
+        New summary including the entry
+    """
+    summary = dict(summary)
+    recent = list(summary['recent'])
+    recent.append(emotion)
+    summary['negative_count'] += emotion in NEGATIVE_EMOTIONS
+    summary['low_energy_count'] += emotion == LOW_ENERGY_EMOTION
+    if len(recent) > MOOD_WINDOW:
+        dropped = recent.pop(0)
+        summary['negative_count'] -= dropped in NEGATIVE_EMOTIONS
+        summary['low_energy_count'] -= dropped == LOW_ENERGY_EMOTION
+    summary['recent'] = recent
+    
+    if emotion == summary['streak_emotion']:
+        summary['streak_length'] += 1
+    else:
+        summary['streak_emotion'] = emotion
+        summary['streak_length'] = 1
+    summary['negative_streak'] = summary['negative_streak'] + 1 if emotion in NEGATIVE_EMOTIONS else 0
+    
+    summary['entries'] += 1
+    if summary['first_timestamp'] is None:
+        summary['first_timestamp'] = timestamp
+    summary['last_timestamp'] = timestamp
+    return summary
+
+class MoodStore:
+    """
+    SQLite-backed mood entries with per-user rolling aggregates
+    
+    Every add_entry appends the entry and updates the user's aggregate row in
+    the same transaction, so summary() is a single primary-key read however
+    long the history gets. The database runs in WAL mode and appends take
+    the write lock up front, so pre-forked workers can share one file.
+    """
+    
+    def __init__(self, path: str = DEFAULT_MOOD_STORE_PATH):
+        """
+        Args:
+            path: SQLite database file (created if missing) or ":memory:"
+        """
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        # user_id -> (entries, last id, timestamps, codes)
+        self._timelines: 'OrderedDict[str, Tuple[int, int, np.ndarray, np.ndarray]]' = OrderedDict()
+    
+    def _migrate(self):
+        """Add and fill the code column in stores created before it existed"""
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(mood_entries)')}
+        if 'code' in columns:
+            return
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.execute('ALTER TABLE mood_entries ADD COLUMN code INTEGER')
+            self._conn.executemany(
+                'UPDATE mood_entries SET code = ? WHERE emotion = ?',
+                [(code, category) for category, code in CATEGORY_CODES.items()]
+            )
+            self._conn.execute('UPDATE mood_entries SET code = ? WHERE code IS NULL', (CATEGORY_CODES['neutral'],))
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+    
+    @staticmethod
+    def _row_to_summary(row: Optional[sqlite3.Row]) -> Dict[str, Any]:
+        if row is None:
+            return empty_summary()
+        summary = {column: row[column] for column in SUMMARY_COLUMNS}
+        summary['recent'] = summary['recent'].split(',') if summary['recent'] else []
+        return summary
+    
+    def _read_summary(self, user_id: str) -> Dict[str, Any]:
+        row = self._conn.execute(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM mood_aggregates WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return self._row_to_summary(row)
+    
+    def add_entry(
+        self,
+        user_id: str,
+        emotion: str,
+        timestamp: Optional[float] = None,
+        confidence: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Record a mood entry and update the user's aggregates
+        
+        Entries are appended in time order, since the recent window and
+        streaks follow insertion order: an entry older than the user's latest
+        one is rejected rather than backfilled.
+        
+        Args:
+            user_id: User or session identifier
+            emotion: Detected emotion (GoEmotion or normalized; stored normalized)
+            timestamp: Entry time in Unix seconds (default now, or the latest
+                entry's time if that is ahead of the clock)
+            confidence: Optional classifier confidence
+        
+        Returns:
+            The user's updated summary (see summary)
+        
+        Raises:
+            ValueError: If timestamp is older than the user's latest entry
+        """
+        normalized = normalize_emotion(emotion)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                current = self._read_summary(user_id)
+                last_timestamp = current['last_timestamp']
+                if timestamp is None:
+                    timestamp = time.time() if last_timestamp is None else max(time.time(), last_timestamp)
+                elif last_timestamp is not None and timestamp < last_timestamp:
+                    raise ValueError(
+                        f"Entry at {timestamp} is older than the latest entry ({last_timestamp}); "
+                        "entries must be added in time order"
+                    )
+                summary = update_summary(current, normalized, timestamp)
+                self._conn.execute(
+                    "INSERT INTO mood_entries (user_id, timestamp, emotion, code, raw_emotion, confidence) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, timestamp, normalized, CATEGORY_CODES[normalized], emotion, confidence)
+                )
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO mood_aggregates (user_id, {', '.join(SUMMARY_COLUMNS)}) "
+                    f"VALUES (?{', ?' * len(SUMMARY_COLUMNS)})",
+                    (user_id, *[','.join(summary[c]) if c == 'recent' else summary[c] for c in SUMMARY_COLUMNS])
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return summary
+    
+    def summary(self, user_id: str) -> Dict[str, Any]:
+        """
+        Rolling aggregates for a user
+        
+        Returns:
+            Dictionary with:
+            - entries: Total number of entries
+            - recent: Normalized emotions of the last MOOD_WINDOW entries, oldest first
+            - negative_count: Negative emotions among recent
+            - low_energy_count: Low-energy entries among recent
+            - streak_emotion / streak_length: Latest emotion and how many
+              entries in a row it has lasted
+            - negative_streak: Consecutive negative entries up to the latest
+            - first_timestamp / last_timestamp: Times of the first and latest entries
+        """
+        with self._lock:
+            return self._read_summary(user_id)
+    
+    def entries(self, user_id: str, limit: Optional[int] = None, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        A user's entries, oldest first
+        
+        Args:
+            user_id: User or session identifier
+            limit: Only the most recent `limit` entries
+            since: Only entries at or after this time (Unix seconds)
+        """
+        query = "SELECT timestamp, emotion, raw_emotion, confidence FROM mood_entries WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if since is not None:
+            query += " AND timestamp >= ?"
+            params.append(since)
+        query += " ORDER BY id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in reversed(rows)]
+    
+    def _fetch_timeline(self, user_id: str, after_id: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, codes) of a user's entries with id > after_id, in insertion order"""
+        cursor = self._conn.execute(
+            "SELECT timestamp, code FROM mood_entries WHERE user_id = ? AND id > ? ORDER BY id", (user_id, after_id)
+        )
+        cursor.row_factory = None
+        rows = np.fromiter(cursor, dtype=TIMELINE_DTYPE)
+        return rows['timestamp'], rows['code']
+    
+    def timeline_arrays(self, user_id: str, since: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        A user's history as arrays for services/mood_analytics.py
+        
+        The encoded history is cached per user. Each call checks it against
+        the user's entry count and latest entry id (indexed lookups), so
+        entries added since, by this or another process, are fetched and
+        appended, and a deleted history is reloaded.
+        
+        Args:
+            user_id: User or session identifier
+            since: Only entries at or after this time (Unix seconds)
+        
+        Returns:
+            Tuple of (timestamps as float64, category codes as int8), oldest first
+        """
+        with self._lock:
+            # One read transaction: the check and the fetch see the same snapshot
+            self._conn.execute('BEGIN')
+            try:
+                count, last_id = self._conn.execute(
+                    "SELECT (SELECT entries FROM mood_aggregates WHERE user_id = ?), "
+                    "(SELECT MAX(id) FROM mood_entries WHERE user_id = ?)",
+                    (user_id, user_id)
+                ).fetchone()
+                count, last_id = count or 0, last_id or 0
+                
+                cached = self._timelines.get(user_id)
+                if cached is not None and (cached[0], cached[1]) == (count, last_id):
+                    timestamps, codes = cached[2], cached[3]
+                else:
+                    timestamps = codes = None
+                    if cached is not None and cached[1] < last_id:
+                        new_timestamps, new_codes = self._fetch_timeline(user_id, cached[1])
+                        if cached[0] + len(new_codes) == count:
+                            timestamps = np.concatenate((cached[2], new_timestamps))
+                            codes = np.concatenate((cached[3], new_codes))
+                    if timestamps is None:
+                        timestamps, codes = self._fetch_timeline(user_id)
+                    self._timelines[user_id] = (count, last_id, timestamps, codes)
+            finally:
+                self._conn.execute('COMMIT')
+            self._timelines.move_to_end(user_id)
+            while len(self._timelines) > MAX_CACHED_TIMELINES:
+                self._timelines.popitem(last=False)
+        
+        if since is not None:
+            keep = timestamps >= since
+            timestamps, codes = timestamps[keep], codes[keep]
+        return timestamps, codes
+    
+    def delete_user(self, user_id: str) -> int:
+        """
+        Remove all of a user's entries and aggregates
+        
+        Returns:
+            Number of entries deleted
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                deleted = self._conn.execute("DELETE FROM mood_entries WHERE user_id = ?", (user_id,)).rowcount
+                self._timelines.pop(user_id, None)
+                self._conn.execute("DELETE FROM mood_aggregates WHERE user_id = ?", (user_id,))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return deleted
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_mood_store() -> MoodStore:
+    """Return the process-wide MoodStore (MOOD_STORE_PATH), opening it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MoodStore(os.environ.get('MOOD_STORE_PATH', DEFAULT_MOOD_STORE_PATH))
+    return _store
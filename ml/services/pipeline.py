@@ -0,0 +1,413 @@
+"""
+Concurrent /emotion-response pipeline
+Runs the per-request stages together and combines them with the
+precompiled catalog content for the emotion
+"""
+
+import asyncio
+import copy
+import time
+from concurrent.futures import Executor
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Set, Tuple
+
+from services.suggestions import personalized_tools
+from services.sentiment_enhanced import (
+    analyze_sentiment_vader,
+    analyze_sentiment_textblob,
+    analyze_sentiment_batch,
+    detect_tone,
+    combine_sentiment,
+    get_sentiment_engine
+)
+from services.affirmations import get_affirmation
+from services.routines import get_recommended_routine
+from services.safety import check_for_safety, check_batch, get_safe_response_override
+from services.response_table import RESPONSE_TABLE, dumps
+
+# Time budget in seconds (measured from the start of the request) for each
+# stage that may be made optional
+STAGE_BUDGETS = {
+    'vader': 0.5,
+    'textblob': 0.25,
+    'tones': 0.25,
+}
+# Stages dropped when they miss their budget, by default only TextBlob (its
+# scores are reported as null). Every other stage always completes, since
+# VADER also drives the intensity-based tools and tones are part of the
+# sentiment; they can be made optional through stage_timeouts.
+OPTIONAL_STAGE_TIMEOUTS = {
+    'textblob': STAGE_BUDGETS['textblob'],
+}
+
+def warm_up_services():
+    """Build the shared sentiment analyzers and the response table ahead of the first request"""
+    get_sentiment_engine()
+    RESPONSE_TABLE.get('neutral')
+
+RESPONSE_FIELDS = (
+    'supportive_message', 'actions', 'tools', 'intervention', 'routine', 'affirmation',
+    'music', 'safe_override_if_any', 'sentiment_analysis', 'skipped_stages'
+)
+
+# Stages that only need the text (see TextStages)
+TEXT_STAGES = ('safety', 'vader', 'textblob', 'tones')
+
+def select_fields(fields: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+    """
+    Validate a field selection
+    
+    Args:
+        fields: Requested response fields, or None for all of them
+    
+    Returns:
+        The requested fields in RESPONSE_FIELDS order
+    
+    Raises:
+        ValueError: If a field name is unknown
+    """
+    if fields is None:
+        return RESPONSE_FIELDS
+    requested = set(fields)
+    unknown = requested.difference(RESPONSE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} (valid: {', '.join(RESPONSE_FIELDS)})")
+    return tuple(field for field in RESPONSE_FIELDS if field in requested)
+
+def text_stages_needed(fields: Iterable[str], intensity: Optional[float] = None) -> Set[str]:
+    """
+    Text stages required to produce the given response fields
+    
+    Sentiment needs VADER, TextBlob and tones; the safety override needs the
+    safety check; tools need VADER only when no intensity is given.
+    """
+    fields = set(fields)
+    needed = set()
+    if 'sentiment_analysis' in fields:
+        needed.update(('vader', 'textblob', 'tones'))
+    if 'safe_override_if_any' in fields:
+        needed.add('safety')
+    if 'tools' in fields and intensity is None:
+        needed.add('vader')
+    return needed
+
+class TextStages:
+    """
+    Text-only stages of the pipeline, started as soon as the text is known
+    
+    Safety, VADER, TextBlob and tone detection don't depend on the emotion,
+    so /analyze starts them before classification and they run alongside
+    inference. Optional stage budgets are measured from construction; stages
+    without a budget are always awaited.
+    """
+    
+    def __init__(
+        self,
+        text_input: Optional[str],
+        executor: Optional[Executor] = None,
+        stage_timeouts: Optional[Dict[str, float]] = None,
+        stages: Optional[Iterable[str]] = None
+    ):
+        """
+        Args:
+            text_input: User text (None or empty starts no stages)
+            executor: Executor to run the stages on (defaults to the loop's executor)
+            stage_timeouts: Optional stages and their budgets in seconds
+                (default OPTIONAL_STAGE_TIMEOUTS)
+            stages: Subset of TEXT_STAGES to run (default all); results of
+                stages not run are None
+        
+        Must be constructed inside the running event loop.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.executor = executor
+        self.started = time.monotonic()
+        self.timeouts = OPTIONAL_STAGE_TIMEOUTS if stage_timeouts is None else stage_timeouts
+        self.skipped_stages: List[str] = []
+        self.text_input = text_input
+        run = set(TEXT_STAGES if stages is None else stages) if text_input else set()
+        # TextBlob can be switched off entirely (SENTIMENT_TEXTBLOB=0)
+        if 'textblob' in run and not get_sentiment_engine().use_textblob:
+            run.discard('textblob')
+        
+        self.safety = self.start(check_for_safety, text_input) if 'safety' in run else None
+        self.vader = self.start(analyze_sentiment_vader, text_input) if 'vader' in run else None
+        self.textblob = self.start(analyze_sentiment_textblob, text_input) if 'textblob' in run else None
+        self.tones = self.start(detect_tone, text_input) if 'tones' in run else None
+        self._vader_scores = None
+        self._safety = None
+    
+    def start(self, fn, *args) -> Awaitable:
+        return self.loop.run_in_executor(self.executor, fn, *args)
+    
+    async def optional(self, name: str, stage: Awaitable) -> Optional[Any]:
+        """
+        Stage result, or None (and listed in skipped_stages) if the stage
+        fails or, for an optional stage, misses its budget
+        """
+        try:
+            if name not in self.timeouts:
+                return await stage
+            remaining = max(0.0, self.started + self.timeouts[name] - time.monotonic())
+            return await asyncio.wait_for(stage, remaining)
+        except asyncio.TimeoutError:
+            print(f"Warning: {name} stage exceeded {self.timeouts[name]:.2f}s, skipping")
+        except Exception as e:
+            print(f"Warning: {name} stage failed: {e}")
+        self.skipped_stages.append(name)
+        return None
+    
+    async def vader_scores(self) -> Optional[Dict[str, float]]:
+        """VADER scores, or None without text or if the stage was skipped"""
+        if self.vader is not None:
+            self._vader_scores = await self.optional('vader', self.vader)
+            self.vader = None
+        return self._vader_scores
+    
+    async def sentiment(self) -> Optional[Dict[str, Any]]:
+        """
+        Combined sentiment analysis, or None without text or VADER scores
+        
+        Skipped TextBlob or tone stages show as None values rather than
+        neutral scores or an empty tone list.
+        """
+        if not self.text_input:
+            return None
+        vader_scores = await self.vader_scores()
+        textblob_scores, tone_tags = await asyncio.gather(
+            self.optional('textblob', self.textblob) if self.textblob else asyncio.sleep(0, None),
+            self.optional('tones', self.tones) if self.tones else asyncio.sleep(0, None)
+        )
+        self.textblob = self.tones = None
+        if vader_scores is None:
+            return None
+        polarity, subjectivity = textblob_scores if textblob_scores is not None else (None, None)
+        return combine_sentiment(vader_scores, polarity, subjectivity, tone_tags)
+    
+    async def safety_result(self) -> Optional[Dict[str, Any]]:
+        """check_for_safety result, or None without text or if the check failed"""
+        if self.safety is not None:
+            self._safety = await self.optional('safety', self.safety)
+            self.safety = None
+        return self._safety
+
+class PrecomputedTextStages:
+    """
+    Text stages whose results are already known (see TextStages)
+    
+    Used by the batch endpoint, where safety and sentiment for all texts
+    come from check_batch and analyze_sentiment_batch up front.
+    """
+    
+    def __init__(
+        self,
+        safety: Optional[Dict[str, Any]],
+        sentiment: Optional[Dict[str, Any]],
+        executor: Optional[Executor] = None
+    ):
+        self.loop = asyncio.get_running_loop()
+        self.executor = executor
+        self.skipped_stages: List[str] = []
+        self._safety = safety
+        self._sentiment = sentiment
+    
+    def start(self, fn, *args) -> Awaitable:
+        return self.loop.run_in_executor(self.executor, fn, *args)
+    
+    async def vader_scores(self) -> Optional[Dict[str, float]]:
+        return self._sentiment['vader_scores'] if self._sentiment is not None else None
+    
+    async def sentiment(self) -> Optional[Dict[str, Any]]:
+        return self._sentiment
+    
+    async def safety_result(self) -> Optional[Dict[str, Any]]:
+        return self._safety
+
+async def compute_dynamic_parts(
+    entry: Dict[str, Any],
+    emotion: str,
+    text_input: Optional[str] = None,
+    intensity: Optional[float] = None,
+    mood_history: Optional[List[Dict]] = None,
+    executor: Optional[Executor] = None,
+    stage_timeouts: Optional[Dict[str, float]] = None,
+    text_stages: Optional[TextStages] = None,
+    mood_summary: Optional[Dict[str, Any]] = None,
+    fields: Optional[Iterable[str]] = None
+) -> Dict[str, Any]:
+    """
+    Compute the per-request parts of an /emotion-response
+    
+    Safety, VADER, TextBlob, tone detection and (with mood history) the
+    routine start together on the executor. Catalog content comes from the
+    precompiled entry; only the tools (high intensity) and routine (mood
+    history or summary) are recomputed when personalization applies. Stages
+    that fail (or, if optional, miss their budget) are dropped and listed in
+    `skipped_stages`; the rest of the response is still returned.
+    Stages that only feed fields outside `fields` are never started.
+    
+    Args:
+        entry: Catalog entry for the emotion (RESPONSE_TABLE.get(emotion))
+        emotion: Detected emotion (can be GoEmotion or normalized)
+        text_input: Optional user text for safety and sentiment analysis
+        intensity: Optional emotion intensity (0.0-1.0)
+        mood_history: Optional list of previous mood entries
+        executor: Executor to run the stages on (defaults to the loop's executor)
+        stage_timeouts: Optional stages and their budgets (default OPTIONAL_STAGE_TIMEOUTS)
+        text_stages: Text stages already started or computed for text_input
+            (TextStages or PrecomputedTextStages); text_input, executor and
+            stage_timeouts are then taken from it
+        fields: Response fields to compute (default all, see select_fields)
+        mood_summary: Optional mood store aggregates (services/mood_store.py),
+            used for the routine instead of mood_history
+    
+    Returns:
+        Dictionary with the requested ones of affirmation, safe_override_if_any,
+        sentiment_analysis and skipped_stages, plus tools/routine only if they
+        differ from the entry
+    """
+    fields = select_fields(fields)
+    stages = text_stages or TextStages(
+        text_input, executor, stage_timeouts, stages=text_stages_needed(fields, intensity)
+    )
+    routine = None
+    if (mood_history or mood_summary) and 'routine' in fields:
+        routine = stages.start(get_recommended_routine, emotion, mood_history, mood_summary)
+    
+    parts = {}
+    if 'affirmation' in fields:
+        parts['affirmation'] = get_affirmation(emotion)
+    
+    # Tools only change with a high intensity, which may come from VADER
+    if 'tools' in fields:
+        vader_scores = await stages.vader_scores()
+        if vader_scores is not None and intensity is None:
+            intensity = abs(vader_scores.get('compound', 0.0))
+        tools = personalized_tools(entry['values']['tools'], entry['normalized'], intensity)
+        if tools is not None:
+            parts['tools'] = tools
+    
+    if 'sentiment_analysis' in fields:
+        parts['sentiment_analysis'] = await stages.sentiment()
+    
+    if routine is not None:
+        try:
+            parts['routine'] = await routine
+        except Exception as e:
+            # Fall back to the catalog routine for the emotion
+            print(f"Warning: routine stage failed: {e}")
+            stages.skipped_stages.append('routine')
+    
+    if 'safe_override_if_any' in fields:
+        safe_override = None
+        safety = await stages.safety_result()
+        if safety is not None:
+            safe_override = get_safe_response_override(emotion, safety)
+        parts['safe_override_if_any'] = safe_override
+    
+    if 'skipped_stages' in fields:
+        parts['skipped_stages'] = stages.skipped_stages
+    return parts
+
+async def build_emotion_response(emotion: str, **kwargs) -> Dict[str, Any]:
+    """
+    Build the /emotion-response payload as a dictionary
+    
+    Takes the same keyword arguments as compute_dynamic_parts (apart from
+    entry). Catalog content is deep-copied, so callers may modify the result.
+    
+    Returns:
+        Dictionary with the EmotionResponse fields (including skipped_stages),
+        or only the requested `fields`
+    """
+    entry = RESPONSE_TABLE.get(emotion)
+    parts = await compute_dynamic_parts(entry, emotion, **kwargs)
+    return {
+        field: parts[field] if field in parts else copy.deepcopy(entry['values'][field])
+        for field in select_fields(kwargs.get('fields'))
+    }
+
+async def render_emotion_response(emotion: str, **kwargs) -> bytes:
+    """
+    Build the /emotion-response payload as serialized JSON
+    
+    Catalog fields are spliced in from the entry's pre-serialized fragments;
+    only the per-request parts are serialized here.
+    
+    Returns:
+        UTF-8 JSON object with the EmotionResponse fields (or only the
+        requested `fields`), in field order
+    """
+    entry = RESPONSE_TABLE.get(emotion)
+    parts = await compute_dynamic_parts(entry, emotion, **kwargs)
+    fragments = entry['json']
+    body = ','.join(
+        f'"{field}":' + (dumps(parts[field]) if field in parts else fragments[field])
+        for field in select_fields(kwargs.get('fields'))
+    )
+    return ('{' + body + '}').encode('utf-8')
+
+async def render_emotion_response_batch(
+    items: List[Dict[str, Any]],
+    executor: Optional[Executor] = None
+) -> List[bytes]:
+    """
+    Build many /emotion-response payloads as serialized JSON
+    
+    Identical requests are rendered once. Safety and sentiment for all
+    distinct texts run through check_batch and analyze_sentiment_batch in
+    one executor call each instead of one set of stages per item; as with
+    other bulk jobs, the optional stage budgets don't apply. Texts are only
+    sent to the batch stages that some item's fields need.
+    
+    Args:
+        items: Requests with 'emotion' and optional 'text_input', 'intensity',
+            'mood_history', 'mood_summary' and 'fields' (the
+            compute_dynamic_parts arguments)
+        executor: Executor to run the stages on (defaults to the loop's executor)
+    
+    Returns:
+        One UTF-8 JSON payload per item, in input order
+    
+    Raises:
+        ValueError: If an item requests an unknown field
+    """
+    loop = asyncio.get_running_loop()
+    selected = [select_fields(item.get('fields')) for item in items]
+    keys = [
+        dumps([item.get(field) for field in ('emotion', 'text_input', 'intensity', 'mood_history', 'mood_summary')]
+              + [list(fields)])
+        for item, fields in zip(items, selected)
+    ]
+    unique = {key: (item, fields) for key, item, fields in zip(keys, items, selected)}
+    
+    safety_texts, sentiment_texts = {}, {}
+    for item, fields in unique.values():
+        if item.get('text_input'):
+            needed = text_stages_needed(fields, item.get('intensity'))
+            if 'safety' in needed:
+                safety_texts[item['text_input']] = None
+            if needed.difference(('safety',)):
+                sentiment_texts[item['text_input']] = None
+    
+    async def run_batch(fn, texts: List[str]) -> Dict[str, Any]:
+        return dict(zip(texts, await loop.run_in_executor(executor, fn, texts))) if texts else {}
+    
+    safety_by_text, sentiment_by_text = await asyncio.gather(
+        run_batch(check_batch, list(safety_texts)),
+        run_batch(analyze_sentiment_batch, list(sentiment_texts))
+    )
+    
+    async def render(item: Dict[str, Any], fields: Tuple[str, ...]) -> bytes:
+        text = item.get('text_input')
+        stages = PrecomputedTextStages(safety_by_text.get(text), sentiment_by_text.get(text), executor)
+        return await render_emotion_response(
+            item['emotion'],
+            intensity=item.get('intensity'),
+            mood_history=item.get('mood_history'),
+            mood_summary=item.get('mood_summary'),
+            text_stages=stages,
+            fields=fields
+        )
+    
+    bodies = dict(zip(unique, await asyncio.gather(*(render(*request) for request in unique.values()))))
+    return [bodies[key] for key in keys]
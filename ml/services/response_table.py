@@ -0,0 +1,87 @@
+"""
+Precomputed per-emotion response table
+Catalog content (suggestions, intervention, routine, music) resolved and
+serialized to JSON once per emotion label instead of on every request
+"""
+
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from services.suggestions import (
+    EMOTION_CATEGORIES,
+    EMOTION_MAPPING,
+    emotion_map_version,
+    get_emotion_suggestions,
+    normalize_emotion
+)
+from services.interventions import get_micro_intervention
+from services.routines import get_recommended_routine
+from services.music import EMOTION_TO_MUSIC, get_music_suggestion
+
+# Response fields whose content depends only on the emotion label
+CATALOG_FIELDS = ('supportive_message', 'actions', 'tools', 'intervention', 'routine', 'music')
+
+def dumps(value: Any) -> str:
+    """Serialize like FastAPI's JSONResponse, so spliced fragments match its output"""
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+def compile_entry(emotion: str) -> Dict[str, Any]:
+    """
+    Resolve the catalog content for one emotion label
+    
+    Interventions, routines and music are looked up by the raw (lowercased)
+    label rather than the normalized category, so entries are per label.
+    
+    Returns:
+        Dictionary with 'normalized' (category), 'values' (field -> content)
+        and 'json' (field -> serialized fragment)
+    """
+    suggestions = get_emotion_suggestions(emotion)
+    values = {
+        'supportive_message': suggestions.get('supportive_message', 'I\'m here to support you.'),
+        'actions': suggestions.get('suggested_actions', []),
+        'tools': suggestions.get('recommended_tools', []),
+        'intervention': get_micro_intervention(emotion, suggestions.get('micro_intervention', 'breathing_reset')),
+        'routine': get_recommended_routine(emotion),
+        'music': get_music_suggestion(emotion),
+    }
+    return {
+        'normalized': normalize_emotion(emotion),
+        'values': values,
+        'json': {field: dumps(value) for field, value in values.items()},
+    }
+
+class ResponseTable:
+    """
+    Compiled catalog entries for every known emotion label
+    
+    Built on first use and rebuilt whenever emotion_map.json is reloaded.
+    Labels outside the known set are compiled on demand and not stored, so
+    arbitrary client input can't grow the table.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+    
+    @staticmethod
+    def known_labels():
+        return sorted(set(EMOTION_CATEGORIES) | set(EMOTION_MAPPING) | set(EMOTION_TO_MUSIC))
+    
+    def _rebuild(self, version: int):
+        self._entries = {label: compile_entry(label) for label in self.known_labels()}
+        self._version = version
+    
+    def get(self, emotion: str) -> Dict[str, Any]:
+        """Catalog entry for an emotion label (see compile_entry)"""
+        version = emotion_map_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._rebuild(version)
+        entry = self._entries.get(emotion.lower())
+        return entry if entry is not None else compile_entry(emotion)
+
+RESPONSE_TABLE = ResponseTable()
@@ -105,7 +105,8 @@ ROUTINES = {
 
 def get_recommended_routine(
     emotion: str,
-    mood_history: Optional[List[Dict]] = None
+    mood_history: Optional[List[Dict]] = None,
+    mood_summary: Optional[Dict] = None
 ) -> Dict:
     """
     Get a recommended routine based on emotion and mood history
@@ -113,6 +114,8 @@ def get_recommended_routine(
     Args:
         emotion: Current detected emotion
         mood_history: Optional list of previous mood entries
+        mood_summary: Optional rolling aggregates from the mood store
+            (services/mood_store.py); used instead of mood_history
         
     Returns:
         Dictionary with routine details
@@ -132,21 +135,26 @@ def get_recommended_routine(
     }
     
     # Analyze mood history for patterns
-    if mood_history:
+    negative_count = low_energy_count = 0
+    if mood_summary:
+        # Counts over the last 7 entries, maintained by the mood store
+        negative_count = mood_summary.get('negative_count', 0)
+        low_energy_count = mood_summary.get('low_energy_count', 0)
+    elif mood_history:
         # Count recent negative emotions
         recent_entries = mood_history[-7:] if len(mood_history) > 7 else mood_history
         negative_count = sum(1 for entry in recent_entries 
                            if entry.get('emotion') in ['sad', 'angry', 'anxious', 'fear', 'stressed'])
-        
-        # If many negative emotions, prioritize stress relief
-        if negative_count >= 5:
-            return ROUTINES.get('stress_relief', ROUTINES['general_wellness'])
-        
-        # If low energy pattern, suggest morning boost
         low_energy_count = sum(1 for entry in recent_entries 
                               if entry.get('emotion') == 'low_energy')
-        if low_energy_count >= 3:
-            return ROUTINES.get('morning_boost', ROUTINES['general_wellness'])
+    
+    # If many negative emotions, prioritize stress relief
+    if negative_count >= 5:
+        return ROUTINES.get('stress_relief', ROUTINES['general_wellness'])
+    
+    # If low energy pattern, suggest morning boost
+    if low_energy_count >= 3:
+        return ROUTINES.get('morning_boost', ROUTINES['general_wellness'])
     
     # Default to emotion-based routine
     routine_key = emotion_to_routine.get(emotion_lower, 'general_wellness')
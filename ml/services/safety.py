@@ -6,28 +6,61 @@ Scans user text for high-risk phrases and provides appropriate support
 from typing import Dict, List, Tuple, Optional
 import re
 
-# High-risk phrases that may indicate crisis situations
-HIGH_RISK_PHRASES = [
-    # Self-harm indicators
-    r'\b(kill\s+myself|end\s+it\s+all|suicide|not\s+worth\s+living|want\s+to\s+die)\b',
-    r'\b(hurt\s+myself|cut\s+myself|self\s+harm|harm\s+myself)\b',
-    r'\b(no\s+point|nothing\s+left|no\s+reason\s+to\s+live|better\s+off\s+dead)\b',
-    
-    # Crisis indicators
-    r'\b(can\'t\s+go\s+on|can\'t\s+take\s+it\s+anymore|giving\s+up|hopeless)\b',
-    r'\b(no\s+way\s+out|trapped|stuck\s+forever|never\s+get\s+better)\b',
-    
-    # Severe distress
-    r'\b(completely\s+alone|nobody\s+cares|everyone\s+hates\s+me|worthless)\b',
-    r'\b(pain\s+too\s+much|can\'t\s+handle\s+it|overwhelming\s+pain)\b',
-]
+from services.keyword_matcher import WORD_PART_PATTERN, KeywordMatch, KeywordMatcher
 
-# Medium-risk phrases (concerning but not immediate crisis)
-MEDIUM_RISK_PHRASES = [
-    r'\b(very\s+depressed|deeply\s+sad|extremely\s+anxious|panic)\b',
-    r'\b(thoughts\s+of\s+death|thinking\s+about\s+ending|considering)\b',
-    r'\b(no\s+one\s+understands|completely\s+isolated|cut\s+off)\b',
-]
+# Risk phrases by level and category. Phrases match as whole words,
+# case-insensitively, with any whitespace between words.
+RISK_PHRASES = {
+    'high': {
+        # Self-harm indicators
+        'self_harm': [
+            'kill myself', 'end it all', 'suicide', 'not worth living', 'want to die',
+            'hurt myself', 'cut myself', 'self harm', 'harm myself',
+            'no point', 'nothing left', 'no reason to live', 'better off dead',
+        ],
+        # Crisis indicators
+        'crisis': [
+            "can't go on", "can't take it anymore", 'giving up', 'hopeless',
+            'no way out', 'trapped', 'stuck forever', 'never get better',
+        ],
+        # Severe distress
+        'severe_distress': [
+            'completely alone', 'nobody cares', 'everyone hates me', 'worthless',
+            'pain too much', "can't handle it", 'overwhelming pain',
+        ],
+    },
+    # Concerning but not immediate crisis
+    'medium': {
+        'acute_distress': ['very depressed', 'deeply sad', 'extremely anxious', 'panic'],
+        'death_ideation': ['thoughts of death', 'thinking about ending', 'considering'],
+        'isolation': ['no one understands', 'completely isolated', 'cut off'],
+    },
+}
+
+RISK_LEVEL_ORDER = ('high', 'medium')
+
+def _phrase_pattern(phrases: List[str]) -> str:
+    return r'\b(' + '|'.join(r'\s+'.join(re.escape(word) for word in phrase.split()) for phrase in phrases) + r')\b'
+
+# Regex form of the phrase lists, one pattern per category (kept for callers of the old lists)
+HIGH_RISK_PHRASES = [_phrase_pattern(phrases) for phrases in RISK_PHRASES['high'].values()]
+MEDIUM_RISK_PHRASES = [_phrase_pattern(phrases) for phrases in RISK_PHRASES['medium'].values()]
+
+# Category -> risk level, and one matcher over every phrase of every level.
+# Tokens split at apostrophes like the \b patterns above, so "suicide" also
+# matches "suicide's" and "can't" matches as can ' t.
+CATEGORY_RISK_LEVEL = {
+    category: level for level, categories in RISK_PHRASES.items() for category in categories
+}
+SAFETY_MATCHER = KeywordMatcher(
+    (
+        (phrase, category)
+        for categories in RISK_PHRASES.values()
+        for category, phrases in categories.items()
+        for phrase in phrases
+    ),
+    token_pattern=WORD_PART_PATTERN,
+)
 
 # Crisis hotline information
 CRISIS_HOTLINES = {
@@ -44,80 +77,146 @@ CRISIS_HOTLINES = {
     }
 }
 
-def check_for_safety(text: str) -> Dict[str, any]:
+HIGH_RISK_MESSAGE = (
+    "I'm concerned about what you've shared. Your life has value, and there are people who want to help. "
+    "Please reach out to a crisis hotline or a trusted person in your life right away. "
+    "You don't have to face this alone."
+)
+HIGH_RISK_RECOMMENDATIONS = (
+    "Contact a crisis hotline immediately (see information below)",
+    "Reach out to a trusted friend, family member, or mental health professional",
+    "Go to your nearest emergency room if you're in immediate danger",
+    "Remember: These feelings are temporary, even when they don't feel that way"
+)
+MEDIUM_RISK_MESSAGE = (
+    "I hear that you're going through a really difficult time. Your feelings are valid, and it's important "
+    "that you have support. Consider reaching out to a mental health professional or someone you trust."
+)
+MEDIUM_RISK_RECOMMENDATIONS = (
+    "Consider speaking with a mental health professional",
+    "Reach out to a trusted friend or family member",
+    "Use the crisis resources available if you need immediate support",
+    "Remember that you don't have to handle everything alone"
+)
+
+def safety_result(matches: List[KeywordMatch]) -> Dict[str, any]:
     """
-    Check text for high-risk phrases indicating crisis or self-harm
+    Build the check_for_safety result from risk phrase matches
     
     Args:
-        text: User input text to analyze
-        
+        matches: (start, end, phrase, category) tuples from SAFETY_MATCHER
+    
     Returns:
-        Dictionary with:
-        - is_risk: Boolean indicating if risk detected
-        - risk_level: 'high', 'medium', or 'low'
-        - safe_message: Appropriate supportive message
-        - recommendations: List of recommendations
-        - hotline_info: Crisis hotline information if risk detected
+        Same dictionary as check_for_safety
     """
-    text_lower = text.lower()
-    
-    # Check for high-risk phrases
-    high_risk_detected = False
-    for pattern in HIGH_RISK_PHRASES:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            high_risk_detected = True
-            break
-    
-    # Check for medium-risk phrases
-    medium_risk_detected = False
-    if not high_risk_detected:
-        for pattern in MEDIUM_RISK_PHRASES:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                medium_risk_detected = True
-                break
-    
-    # Determine risk level
-    if high_risk_detected:
-        risk_level = 'high'
-        safe_message = (
-            "I'm concerned about what you've shared. Your life has value, and there are people who want to help. "
-            "Please reach out to a crisis hotline or a trusted person in your life right away. "
-            "You don't have to face this alone."
-        )
-        recommendations = [
-            "Contact a crisis hotline immediately (see information below)",
-            "Reach out to a trusted friend, family member, or mental health professional",
-            "Go to your nearest emergency room if you're in immediate danger",
-            "Remember: These feelings are temporary, even when they don't feel that way"
-        ]
+    categories = []
+    for _, _, _, category in matches:
+        if category not in categories:
+            categories.append(category)
+    levels = {CATEGORY_RISK_LEVEL[category] for category in categories}
+    risk_level = next((level for level in RISK_LEVEL_ORDER if level in levels), 'low')
+    # Highest-risk categories first
+    categories.sort(key=lambda category: RISK_LEVEL_ORDER.index(CATEGORY_RISK_LEVEL[category]))
+    
+    if risk_level == 'high':
+        safe_message = HIGH_RISK_MESSAGE
+        recommendations = list(HIGH_RISK_RECOMMENDATIONS)
         hotline_info = CRISIS_HOTLINES
-    elif medium_risk_detected:
-        risk_level = 'medium'
-        safe_message = (
-            "I hear that you're going through a really difficult time. Your feelings are valid, and it's important "
-            "that you have support. Consider reaching out to a mental health professional or someone you trust."
-        )
-        recommendations = [
-            "Consider speaking with a mental health professional",
-            "Reach out to a trusted friend or family member",
-            "Use the crisis resources available if you need immediate support",
-            "Remember that you don't have to handle everything alone"
-        ]
+    elif risk_level == 'medium':
+        safe_message = MEDIUM_RISK_MESSAGE
+        recommendations = list(MEDIUM_RISK_RECOMMENDATIONS)
         hotline_info = CRISIS_HOTLINES
     else:
-        risk_level = 'low'
         safe_message = None
         recommendations = []
         hotline_info = None
     
     return {
-        'is_risk': high_risk_detected or medium_risk_detected,
+        'is_risk': risk_level != 'low',
         'risk_level': risk_level,
+        'categories': categories,
+        'matched_phrases': [phrase for _, _, phrase, _ in matches],
         'safe_message': safe_message,
         'recommendations': recommendations,
         'hotline_info': hotline_info
     }
 
+def check_for_safety(text: str) -> Dict[str, any]:
+    """
+    Check text for high-risk phrases indicating crisis or self-harm
+    
+    All phrases of all risk levels are found in a single pass over the text.
+    
+    Args:
+        text: User input text to analyze
+    
+    Returns:
+        Dictionary with:
+        - is_risk: Boolean indicating if risk detected
+        - risk_level: 'high', 'medium', or 'low'
+        - categories: Phrase categories that fired (e.g. 'self_harm'), highest risk first
+        - matched_phrases: Risk phrases found in the text
+        - safe_message: Appropriate supportive message
+        - recommendations: List of recommendations
+        - hotline_info: Crisis hotline information if risk detected
+    """
+    return safety_result(SAFETY_MATCHER.find_all(text))
+
+def check_batch(texts: List[str]) -> List[Dict[str, any]]:
+    """
+    Run check_for_safety over many texts
+    
+    Returns:
+        One result dictionary per input text, in order
+    """
+    return [safety_result(SAFETY_MATCHER.find_all(text)) for text in texts]
+
+class StreamingSafetyScanner:
+    """
+    Safety check for text that arrives in pieces (typing, chat over a socket)
+    
+    Each chunk is scanned once; partial phrases carry over between chunks,
+    so risk is flagged as soon as a phrase completes without rescanning the
+    transcript so far. A phrase ending exactly at the end of a chunk is
+    confirmed by the next chunk (or flush()), since the last word might
+    still continue. Only the first occurrence of each phrase is kept in
+    `matches`, so a long stream holds at most one entry per risk phrase.
+    """
+    
+    def __init__(self):
+        self._stream = SAFETY_MATCHER.stream()
+        self.matches: List[KeywordMatch] = []
+        self._seen = set()
+    
+    def _record(self, new_matches: List[KeywordMatch]):
+        for match in new_matches:
+            key = (match[2], match[3])
+            if key not in self._seen:
+                self._seen.add(key)
+                self.matches.append(match)
+    
+    def feed(self, chunk: str) -> List[KeywordMatch]:
+        """
+        Scan the next chunk
+        
+        Returns:
+            Risk phrases completed by this chunk as (start, end, phrase, category),
+            offsets counted from the start of the stream
+        """
+        new_matches = self._stream.feed(chunk)
+        self._record(new_matches)
+        return new_matches
+    
+    def flush(self) -> List[KeywordMatch]:
+        """Scan any held-back partial word (call at the end of a message)"""
+        new_matches = self._stream.flush()
+        self._record(new_matches)
+        return new_matches
+    
+    def result(self) -> Dict[str, any]:
+        """check_for_safety-style result for everything scanned so far"""
+        return safety_result(self.matches)
+
 def get_safe_response_override(emotion: str, safety_check: Dict) -> Optional[Dict]:
     """
     Get a safe response override if safety concerns are detected
@@ -125,7 +224,7 @@ def get_safe_response_override(emotion: str, safety_check: Dict) -> Optional[Dic
     Args:
         emotion: Detected emotion
         safety_check: Result from check_for_safety()
-        
+    
     Returns:
         Optional dictionary with override response, or None if no override needed
     """
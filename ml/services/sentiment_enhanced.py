@@ -11,13 +11,21 @@ except ImportError:
     print("Warning: vaderSentiment not installed. Install with: pip install vaderSentiment")
 
 try:
-    from textblob import TextBlob
+    from textblob.en.sentiments import PatternAnalyzer
     TEXTBLOB_AVAILABLE = True
 except ImportError:
     TEXTBLOB_AVAILABLE = False
     print("Warning: textblob not installed. Install with: pip install textblob")
 
-from typing import Dict, List, Tuple
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from services.keyword_matcher import KeywordMatcher
+
+# TextBlob is the slowest analyzer; SENTIMENT_TEXTBLOB=0 turns it off for
+# latency-sensitive deployments (polarity/subjectivity are then None)
+TEXTBLOB_ENABLED = os.environ.get("SENTIMENT_TEXTBLOB", "1").lower() not in ("0", "false", "no")
 
 # Tone detection keywords
 TONE_KEYWORDS = {
@@ -29,6 +37,80 @@ TONE_KEYWORDS = {
     'positive': ['great', 'wonderful', 'amazing', 'excellent', 'fantastic', 'love', 'happy', 'joy', 'grateful'],
 }
 
+# Compiled once at import; rebuild with KeywordMatcher.from_groups if TONE_KEYWORDS changes
+TONE_MATCHER = KeywordMatcher.from_groups(TONE_KEYWORDS)
+
+class SentimentEngine:
+    """
+    VADER and TextBlob analyzers built once and shared across requests
+    
+    Constructing SentimentIntensityAnalyzer parses the VADER lexicon, so it is
+    done once here instead of per call. Both analyzers only read their lexicons
+    after construction, so one engine can serve many threads; TextBlob's lazily
+    loaded lexicon is forced at construction for the same reason.
+    """
+    
+    def __init__(self, use_textblob: bool = TEXTBLOB_ENABLED):
+        """
+        Args:
+            use_textblob: Run the TextBlob stage (False skips it entirely)
+        """
+        self.vader_analyzer = SentimentIntensityAnalyzer() if VADER_AVAILABLE else None
+        self.use_textblob = use_textblob and TEXTBLOB_AVAILABLE
+        self.textblob_analyzer = None
+        if self.use_textblob:
+            self.textblob_analyzer = PatternAnalyzer()
+            self.textblob_analyzer.analyze("warm up")
+    
+    def vader(self, text: str) -> Dict[str, float]:
+        """VADER 'compound', 'pos', 'neu', 'neg' scores"""
+        if self.vader_analyzer is None:
+            return {'compound': 0.0, 'pos': 0.0, 'neu': 1.0, 'neg': 0.0}
+        return self.vader_analyzer.polarity_scores(text)
+    
+    def textblob(self, text: str) -> Tuple[Optional[float], Optional[float]]:
+        """TextBlob (polarity, subjectivity), or (None, None) when the stage is off"""
+        if not TEXTBLOB_AVAILABLE:
+            return (0.0, 0.5)
+        if self.textblob_analyzer is None:
+            return (None, None)
+        # Same scores as TextBlob(text).sentiment without building a blob
+        sentiment = self.textblob_analyzer.analyze(text)
+        return sentiment.polarity, sentiment.subjectivity
+    
+    def analyze(self, text: str) -> Dict[str, any]:
+        """Comprehensive analysis of one text (see analyze_sentiment_comprehensive)"""
+        polarity, subjectivity = self.textblob(text)
+        return combine_sentiment(self.vader(text), polarity, subjectivity, detect_tone(text))
+    
+    def analyze_batch(self, texts: List[str]) -> List[Dict[str, any]]:
+        """
+        Comprehensive analysis of many texts
+        
+        Identical texts are analyzed once, which is common in bulk jobs
+        (repeated check-ins, templated messages).
+        
+        Returns:
+            One result dictionary per input text, in order
+        """
+        unique = {}
+        for text in texts:
+            if text not in unique:
+                unique[text] = self.analyze(text)
+        return [dict(unique[text]) for text in texts]
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_sentiment_engine() -> SentimentEngine:
+    """Return the process-wide SentimentEngine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SentimentEngine()
+    return _engine
+
 def analyze_sentiment_vader(text: str) -> Dict[str, float]:
     """
     Analyze sentiment using VADER
@@ -36,60 +118,60 @@ def analyze_sentiment_vader(text: str) -> Dict[str, float]:
     Returns:
         Dictionary with 'compound', 'pos', 'neu', 'neg' scores
     """
-    if not VADER_AVAILABLE:
-        return {'compound': 0.0, 'pos': 0.0, 'neu': 1.0, 'neg': 0.0}
-    
-    analyzer = SentimentIntensityAnalyzer()
-    scores = analyzer.polarity_scores(text)
-    return scores
+    return get_sentiment_engine().vader(text)
 
-def analyze_sentiment_textblob(text: str) -> Tuple[float, float]:
+def analyze_sentiment_textblob(text: str) -> Tuple[Optional[float], Optional[float]]:
     """
     Analyze sentiment using TextBlob
     
     Returns:
-        Tuple of (polarity, subjectivity)
+        Tuple of (polarity, subjectivity), or (None, None) if TextBlob is disabled
         Polarity: -1.0 (negative) to 1.0 (positive)
         Subjectivity: 0.0 (objective) to 1.0 (subjective)
     """
-    if not TEXTBLOB_AVAILABLE:
-        return (0.0, 0.5)
-    
-    blob = TextBlob(text)
-    return blob.sentiment.polarity, blob.sentiment.subjectivity
+    return get_sentiment_engine().textblob(text)
 
 def detect_tone(text: str) -> List[str]:
     """
     Detect tone tags from text
     
+    Keywords match as whole words in a single pass over the text.
+    
     Returns:
         List of detected tones
     """
-    text_lower = text.lower()
-    detected_tones = []
-    
-    for tone, keywords in TONE_KEYWORDS.items():
-        if any(keyword in text_lower for keyword in keywords):
-            detected_tones.append(tone)
-    
-    return detected_tones
+    found = TONE_MATCHER.labels(text)
+    return [tone for tone in TONE_KEYWORDS if tone in found]
 
-def analyze_sentiment_comprehensive(text: str) -> Dict[str, any]:
+def detect_tone_spans(text: str) -> List[Dict[str, any]]:
     """
-    Comprehensive sentiment analysis combining VADER, TextBlob, and tone detection
+    Detect tone keywords with their positions
     
     Returns:
-        Dictionary with:
-        - vader_scores: VADER sentiment scores
-        - textblob_polarity: TextBlob polarity (-1 to 1)
-        - textblob_subjectivity: TextBlob subjectivity (0 to 1)
-        - tones: List of detected tones
-        - overall_sentiment: 'positive', 'negative', or 'neutral'
+        List of dictionaries with 'tone', 'keyword', 'start' and 'end'
+        (character offsets into text), in order of appearance
+    """
+    return [
+        {'tone': tone, 'keyword': keyword, 'start': start, 'end': end}
+        for start, end, keyword, tone in sorted(TONE_MATCHER.find_all(text))
+    ]
+
+def combine_sentiment(
+    vader_scores: Dict[str, float],
+    polarity: Optional[float],
+    subjectivity: Optional[float],
+    tones: Optional[List[str]]
+) -> Dict[str, any]:
     """
-    vader_scores = analyze_sentiment_vader(text)
-    polarity, subjectivity = analyze_sentiment_textblob(text)
-    tones = detect_tone(text)
+    Combine the individual analyzer outputs into one sentiment summary
+    
+    Lets callers run VADER, TextBlob and tone detection separately (e.g.
+    concurrently); TextBlob scores and tones may be None if that stage was
+    skipped.
     
+    Returns:
+        Same dictionary as analyze_sentiment_comprehensive
+    """
     # Determine overall sentiment
     compound = vader_scores.get('compound', 0.0)
     if compound >= 0.05:
@@ -108,3 +190,25 @@ def analyze_sentiment_comprehensive(text: str) -> Dict[str, any]:
         'intensity': abs(compound)  # Intensity of emotion
     }
 
+def analyze_sentiment_comprehensive(text: str) -> Dict[str, any]:
+    """
+    Comprehensive sentiment analysis combining VADER, TextBlob, and tone detection
+    
+    Returns:
+        Dictionary with:
+        - vader_scores: VADER sentiment scores
+        - textblob_polarity: TextBlob polarity (-1 to 1)
+        - textblob_subjectivity: TextBlob subjectivity (0 to 1)
+        - tones: List of detected tones
+        - overall_sentiment: 'positive', 'negative', or 'neutral'
+    """
+    return get_sentiment_engine().analyze(text)
+
+def analyze_sentiment_batch(texts: List[str]) -> List[Dict[str, any]]:
+    """
+    Comprehensive sentiment analysis for a list of texts
+    
+    Returns:
+        One analyze_sentiment_comprehensive result per text, in order
+    """
+    return get_sentiment_engine().analyze_batch(texts)
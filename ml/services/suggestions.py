@@ -5,7 +5,10 @@ Provides structured suggestions based on detected emotions
 
 import json
 import os
-from typing import Dict, List, Optional, Any
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Optional, Any, Mapping, Sequence
 
 # Map GoEmotions to our supported emotion categories
 EMOTION_MAPPING = {
@@ -50,10 +53,18 @@ EMOTION_MAPPING = {
     'desire': 'neutral',
 }
 
+EMOTION_MAP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "emotion_map.json")
+
+# Normalized categories the emotion map is keyed by
+EMOTION_CATEGORIES = ('happy', 'sad', 'angry', 'anxious', 'fear', 'stressed', 'low_energy', 'neutral')
+
+# How often (seconds) to stat emotion_map.json for changes; between checks
+# requests are served from memory without touching the disk
+EMOTION_MAP_CHECK_INTERVAL = 2.0
+
 def load_emotion_map() -> Dict[str, Any]:
     """Load emotion mapping from JSON file"""
-    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    emotion_map_path = os.path.join(script_dir, "emotion_map.json")
+    emotion_map_path = EMOTION_MAP_PATH
     
     try:
         with open(emotion_map_path, 'r', encoding='utf-8') as f:
@@ -65,6 +76,76 @@ def load_emotion_map() -> Dict[str, Any]:
         print(f"Error parsing emotion_map.json: {e}")
         return {}
 
+def _freeze(value: Any) -> Any:
+    """Recursively convert dicts/lists into read-only mappings/tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _thaw(value: Any) -> Any:
+    """Mutable copy of a frozen value (entries are small, so this is cheap)"""
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+def compile_emotion_map(raw_map: Dict[str, Any]) -> Mapping[str, Mapping[str, Any]]:
+    """
+    Precompile the raw emotion map into a read-only lookup table
+    
+    Every normalized category gets an entry (missing ones fall back to the
+    'neutral' entry, as lookups always have), so a lookup is a single dict get.
+    """
+    neutral = raw_map.get('neutral', {})
+    compiled = {emotion: _freeze(raw_map.get(emotion, neutral)) for emotion in EMOTION_CATEGORIES}
+    for emotion, entry in raw_map.items():
+        compiled.setdefault(emotion, _freeze(entry))
+    return MappingProxyType(compiled)
+
+_emotion_map_lock = threading.Lock()
+_emotion_map_state = {'compiled': None, 'mtime': None, 'checked_at': 0.0, 'version': 0}
+
+def _emotion_map_mtime() -> Optional[float]:
+    try:
+        return os.stat(EMOTION_MAP_PATH).st_mtime
+    except OSError:
+        return None
+
+def get_emotion_map() -> Mapping[str, Mapping[str, Any]]:
+    """
+    Return the compiled emotion map, reloading it if emotion_map.json changed
+    
+    The file's mtime is checked at most every EMOTION_MAP_CHECK_INTERVAL
+    seconds, so edits are picked up without a restart while requests in
+    between don't touch the disk. The returned structure is read-only and
+    shared; use get_emotion_suggestions() for a mutable per-request copy.
+    """
+    state = _emotion_map_state
+    now = time.monotonic()
+    if state['compiled'] is not None and now - state['checked_at'] < EMOTION_MAP_CHECK_INTERVAL:
+        return state['compiled']
+    
+    with _emotion_map_lock:
+        if state['compiled'] is not None and now - state['checked_at'] < EMOTION_MAP_CHECK_INTERVAL:
+            return state['compiled']
+        mtime = _emotion_map_mtime()
+        if state['compiled'] is None or mtime != state['mtime']:
+            if state['compiled'] is not None:
+                print("emotion_map.json changed, reloading")
+            state['compiled'] = compile_emotion_map(load_emotion_map())
+            state['mtime'] = mtime
+            state['version'] += 1
+        state['checked_at'] = now
+        return state['compiled']
+
+def emotion_map_version() -> int:
+    """Counter bumped on every (re)load of emotion_map.json"""
+    get_emotion_map()
+    return _emotion_map_state['version']
+
 def normalize_emotion(emotion: str) -> str:
     """
     Normalize emotion from GoEmotions (28 emotions) to our 8 categories
@@ -72,17 +153,35 @@ def normalize_emotion(emotion: str) -> str:
     emotion_lower = emotion.lower()
     
     # Direct match
-    if emotion_lower in ['happy', 'sad', 'angry', 'anxious', 'fear', 'stressed', 'low_energy', 'neutral']:
+    if emotion_lower in EMOTION_CATEGORIES:
         return emotion_lower
     
     # Map from GoEmotions
     return EMOTION_MAPPING.get(emotion_lower, 'neutral')
 
+def personalized_tools(
+    tools: Sequence[str],
+    normalized_emotion: str,
+    intensity: Optional[float]
+) -> Optional[List[str]]:
+    """
+    Intensity-based adjustment of the recommended tools
+    
+    Returns:
+        New tool list, or None if the tools stay as they are
+    """
+    # For high intensity negative emotions, prioritize immediate interventions
+    if intensity and intensity > 0.7 and normalized_emotion in ['angry', 'anxious', 'fear', 'stressed']:
+        if 'breathing_exercise' not in tools:
+            return ['breathing_exercise'] + list(tools)
+    return None
+
 def get_emotion_suggestions(
     emotion: str,
     text: Optional[str] = None,
     intensity: Optional[float] = None,
-    mood_history: Optional[List[Dict]] = None
+    mood_history: Optional[List[Dict]] = None,
+    mood_summary: Optional[Dict] = None
 ) -> Dict[str, Any]:
     """
     Get comprehensive suggestions based on emotion
@@ -92,33 +191,36 @@ def get_emotion_suggestions(
         text: Optional user text input
         intensity: Optional emotion intensity (0.0-1.0)
         mood_history: Optional list of previous mood entries
+        mood_summary: Optional rolling aggregates from the mood store
+            (services/mood_store.py); used instead of mood_history
         
     Returns:
         Dictionary with supportive_message, suggested_actions, recommended_tools,
         micro_intervention, music_suggestion, personalized_routine, affirmation
     """
-    emotion_map = load_emotion_map()
+    emotion_map = get_emotion_map()
     
     # Normalize emotion to our categories
     normalized_emotion = normalize_emotion(emotion)
     
-    # Get base suggestions from emotion map
-    base_suggestions = emotion_map.get(normalized_emotion, emotion_map.get('neutral', {}))
+    # Personalize a copy of the shared entry, never the entry itself
+    base_suggestions = _thaw(emotion_map.get(normalized_emotion, MappingProxyType({})))
     
     # If intensity is high, we might want to emphasize certain tools
-    if intensity and intensity > 0.7:
-        # For high intensity negative emotions, prioritize immediate interventions
-        if normalized_emotion in ['angry', 'anxious', 'fear', 'stressed']:
-            if 'breathing_exercise' not in base_suggestions.get('recommended_tools', []):
-                base_suggestions.setdefault('recommended_tools', []).insert(0, 'breathing_exercise')
+    tools = personalized_tools(base_suggestions.get('recommended_tools', []), normalized_emotion, intensity)
+    if tools is not None:
+        base_suggestions['recommended_tools'] = tools
     
     # If mood history shows patterns, we could adjust routine suggestions
-    if mood_history:
+    recent_negative = 0
+    if mood_summary:
+        recent_negative = mood_summary.get('negative_count', 0)
+    elif mood_history:
         recent_negative = sum(1 for entry in mood_history[-7:] 
                             if entry.get('emotion') in ['sad', 'angry', 'anxious', 'fear', 'stressed'])
-        if recent_negative >= 5:
-            # If many recent negative emotions, suggest stress relief routine
-            base_suggestions['personalized_routine'] = 'stress_relief'
+    if recent_negative >= 5:
+        # If many recent negative emotions, suggest stress relief routine
+        base_suggestions['personalized_routine'] = 'stress_relief'
     
     return base_suggestions
 
@@ -0,0 +1,99 @@
+"""
+Mood store checks (run with: python -m pytest test_mood_store.py)
+"""
+
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+import api_server
+from services.mood_analytics import encode_emotions
+from services.mood_store import MoodStore
+
+def test_analyze_before_model_ready_records_nothing(monkeypatch):
+    store = MoodStore(':memory:')
+    store.add_entry('user', 'sadness', 1_700_000_000.0)
+    before = store.summary('user')
+    monkeypatch.setattr(api_server, 'get_mood_store', lambda: store)
+    monkeypatch.setattr(api_server, 'classifier', None)
+    
+    # Without the lifespan context the model is never loaded: /analyze answers from the fallback
+    client = TestClient(api_server.app)
+    response = client.post('/analyze', json={'text': 'I feel fine today', 'user_id': 'user'})
+    
+    assert response.status_code == 200
+    assert response.json()['stage'] is None
+    assert store.summary('user') == before
+    assert len(store.entries('user')) == 1
+
+def test_backfilled_entry_is_rejected():
+    store = MoodStore(':memory:')
+    store.add_entry('user', 'joy', 1_700_000_000.0)
+    store.add_entry('user', 'sadness', 1_700_000_200.0)
+    before = store.summary('user')
+    
+    try:
+        store.add_entry('user', 'anger', 1_700_000_100.0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("out-of-order entry was accepted")
+    assert store.summary('user') == before
+    assert before['last_timestamp'] == 1_700_000_200.0
+    assert before['recent'] == ['happy', 'sad']
+    
+    # Same time as the latest entry is still in order; no timestamp never goes back
+    store.add_entry('user', 'anger', 1_700_000_200.0)
+    assert store.add_entry('user', 'joy')['last_timestamp'] >= 1_700_000_200.0
+
+def test_post_mood_backfill_is_422(monkeypatch):
+    store = MoodStore(':memory:')
+    monkeypatch.setattr(api_server, 'get_mood_store', lambda: store)
+    client = TestClient(api_server.app)
+    
+    assert client.post('/mood', json={'user_id': 'user', 'emotion': 'joy', 'timestamp': 1_700_000_200.0}).status_code == 200
+    response = client.post('/mood', json={'user_id': 'user', 'emotion': 'sadness', 'timestamp': 1_700_000_100.0})
+    assert response.status_code == 422
+    assert store.summary('user')['last_timestamp'] == 1_700_000_200.0
+    assert store.summary('user')['recent'] == ['happy']
+
+def test_timeline_arrays_follow_other_writers(tmp_path):
+    path = str(tmp_path / 'mood.db')
+    writer, reader = MoodStore(path), MoodStore(path)
+    writer.add_entry('user', 'joy', 1_700_000_000.0)
+    writer.add_entry('user', 'sadness', 1_700_000_100.0)
+    
+    timestamps, codes = reader.timeline_arrays('user')
+    assert timestamps.tolist() == [1_700_000_000.0, 1_700_000_100.0]
+    assert codes.tolist() == encode_emotions(['joy', 'sadness']).tolist()
+    
+    # A cached history picks up entries written through another connection
+    writer.add_entry('user', 'nervousness', 1_700_000_200.0)
+    timestamps, codes = reader.timeline_arrays('user')
+    assert codes.tolist() == encode_emotions(['joy', 'sadness', 'nervousness']).tolist()
+    assert reader.timeline_arrays('user', since=1_700_000_100.0)[0].tolist() == [1_700_000_100.0, 1_700_000_200.0]
+    
+    # ...and a history deleted and recorded again
+    writer.delete_user('user')
+    assert len(reader.timeline_arrays('user')[0]) == 0
+    writer.add_entry('user', 'anger', 1_700_000_300.0)
+    assert reader.timeline_arrays('user')[1].tolist() == encode_emotions(['anger']).tolist()
+
+def test_store_without_code_column_is_migrated(tmp_path):
+    path = str(tmp_path / 'mood.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE mood_entries (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+        "timestamp REAL NOT NULL, emotion TEXT NOT NULL, raw_emotion TEXT, confidence REAL);"
+        "INSERT INTO mood_entries (user_id, timestamp, emotion) VALUES ('user', 1700000000.0, 'happy');"
+        "INSERT INTO mood_entries (user_id, timestamp, emotion) VALUES ('user', 1700000100.0, 'anxious');"
+    )
+    conn.close()
+    
+    store = MoodStore(path)
+    store.add_entry('user', 'sadness', 1_700_000_200.0)
+    assert store.timeline_arrays('user')[1].tolist() == encode_emotions(['happy', 'anxious', 'sad']).tolist()
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,73 @@
+"""
+Check that the compiled safety matcher flags the same risk level as the
+original per-category regexes (run with: python -m pytest test_safety_matcher.py)
+"""
+
+import re
+
+from services.safety import (
+    HIGH_RISK_PHRASES,
+    MEDIUM_RISK_PHRASES,
+    RISK_PHRASES,
+    StreamingSafetyScanner,
+    check_batch,
+    check_for_safety,
+)
+
+def regex_risk_level(text: str) -> str:
+    """Risk level as the original check_for_safety computed it"""
+    text_lower = text.lower()
+    if any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in HIGH_RISK_PHRASES):
+        return 'high'
+    if any(re.search(pattern, text_lower, re.IGNORECASE) for pattern in MEDIUM_RISK_PHRASES):
+        return 'medium'
+    return 'low'
+
+def phrase_variants(phrase: str):
+    """A phrase in the forms users write it: possessives, contractions, case, spacing"""
+    yield phrase
+    yield phrase.upper()
+    yield f"{phrase}'s the only option left"
+    yield f"I've been thinking {phrase}'s easier"
+    yield f"it's {phrase}."
+    yield f"honestly... {phrase}!!"
+    yield f"({phrase})"
+    yield '\n  '.join(phrase.split())
+    yield f"{phrase}s"
+    yield f"un{phrase}"
+    yield f"{phrase}_"
+    yield f"I don't think {phrase[:-1]}"
+
+ALL_PHRASES = [
+    phrase
+    for categories in RISK_PHRASES.values()
+    for phrases in categories.values()
+    for phrase in phrases
+]
+
+def test_matcher_agrees_with_regexes():
+    for phrase in ALL_PHRASES:
+        for text in phrase_variants(phrase):
+            assert check_for_safety(text)['risk_level'] == regex_risk_level(text), text
+
+def test_possessives_are_high_risk():
+    for text in ["suicide's the only option left", "I've been thinking suicide's easier", "I CAN'T GO ON"]:
+        assert check_for_safety(text)['risk_level'] == 'high', text
+
+def test_batch_and_stream_agree():
+    texts = [text for phrase in ALL_PHRASES for text in phrase_variants(phrase)]
+    expected = [regex_risk_level(text) for text in texts]
+    assert [result['risk_level'] for result in check_batch(texts)] == expected
+    
+    for text, level in zip(texts, expected):
+        scanner = StreamingSafetyScanner()
+        for i in range(0, len(text), 3):
+            scanner.feed(text[i:i + 3])
+        scanner.flush()
+        assert scanner.result()['risk_level'] == level, text
+
+if __name__ == "__main__":
+    test_matcher_agrees_with_regexes()
+    test_possessives_are_high_risk()
+    test_batch_and_stream_agree()
+    print("OK")
@@ -32,6 +32,10 @@ CONFIG = {
     "warmup_steps": 100,
     "save_dir": "checkpoints",  # Relative to ml/ directory
     "patience": 3,  # Early stopping patience
+    # Early-exit heads (trained on top of the frozen best_model)
+    "early_exit_layers": [1, 2, 3, 4, 5],
+    "early_exit_epochs": 2,
+    "early_exit_learning_rate": 1e-3,
 }
 
 # GoEmotions emotion labels (simplified version has 28 emotions)
@@ -285,11 +289,11 @@ def train():
             patience_counter = 0
             print(f"New best F1 score: {val_f1:.4f}. Saving model...")
             
-            model.save_pretrained(os.path.join(CONFIG["save_dir"], "best_model"))
+            model.save_pretrained(os.path.join(CONFIG["save_dir"], "best_model"), safe_serialization=True)
             tokenizer.save_pretrained(os.path.join(CONFIG["save_dir"], "best_model"))
         else:
             patience_counter += 1
-            print(f"No improvement. Patience: {patience_counter}/{CONFIG["patience"]}")
+            print(f"No improvement. Patience: {patience_counter}/{CONFIG['patience']}")
         
         # Early stopping
         if patience_counter >= CONFIG["patience"]:
@@ -322,9 +326,114 @@ def train():
             "test_f1_macro": test_f1
         }, f, indent=2)
     
-    print(f"\nModel saved to: {CONFIG["save_dir"]}/best_model")
+    print(f"\nModel saved to: {CONFIG['save_dir']}/best_model")
     print("Training completed!")
 
+def train_early_exit_heads():
+    """
+    Train lightweight classifier heads after intermediate layers of best_model
+    
+    The fine-tuned model stays frozen; each head learns to predict the emotion
+    from the [CLS] state of its layer. The heads are saved next to the model as
+    early_exit_heads.pt for EmotionClassifier(early_exit_threshold=...).
+    """
+    from early_exit import EarlyExitHeads, EARLY_EXIT_HEADS_FILENAME, layer_cls_states
+    
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Using device: {device}")
+    
+    model_dir = os.path.join(CONFIG["save_dir"], "best_model")
+    if not os.path.exists(model_dir):
+        print(f"Error: Model not found at {model_dir}")
+        print("Please train the model first using: python train_model.py")
+        return
+    
+    (X_train, y_train), (X_val, y_val), _, _, _ = load_and_prepare_data()
+    
+    tokenizer = DistilBertTokenizer.from_pretrained(model_dir)
+    model = DistilBertForSequenceClassification.from_pretrained(model_dir)
+    model.to(device)
+    model.eval()
+    for param in model.parameters():
+        param.requires_grad = False
+    
+    exit_layers = [layer for layer in CONFIG["early_exit_layers"] if layer < model.config.n_layers]
+    heads = EarlyExitHeads(model.config.dim, model.config.num_labels, exit_layers)
+    heads.to(device)
+    
+    train_loader = DataLoader(
+        EmotionDataset(X_train, y_train, tokenizer, CONFIG["max_length"]),
+        batch_size=CONFIG["batch_size"],
+        shuffle=True
+    )
+    val_loader = DataLoader(
+        EmotionDataset(X_val, y_val, tokenizer, CONFIG["max_length"]),
+        batch_size=CONFIG["batch_size"],
+        shuffle=False
+    )
+    
+    optimizer = AdamW(heads.parameters(), lr=CONFIG["early_exit_learning_rate"])
+    criterion = nn.CrossEntropyLoss()
+    
+    print(f"\nTraining early-exit heads after layers {exit_layers}...")
+    for epoch in range(CONFIG["early_exit_epochs"]):
+        print(f"\nEpoch {epoch + 1}/{CONFIG['early_exit_epochs']}")
+        heads.train()
+        total_loss = 0
+        
+        progress_bar = tqdm(train_loader, desc="Training heads")
+        for batch in progress_bar:
+            input_ids = batch["input_ids"].to(device)
+            attention_mask = batch["attention_mask"].to(device)
+            labels = batch["labels"].to(device)
+            
+            with torch.no_grad():
+                states = layer_cls_states(model, input_ids, attention_mask, exit_layers)
+            
+            optimizer.zero_grad()
+            loss = sum(criterion(heads(layer, states[layer]), labels) for layer in exit_layers)
+            loss.backward()
+            optimizer.step()
+            
+            total_loss += loss.item()
+            progress_bar.set_postfix({"loss": loss.item()})
+        
+        # Per-head validation accuracy
+        heads.eval()
+        correct = {layer: 0 for layer in exit_layers}
+        total = 0
+        with torch.no_grad():
+            for batch in tqdm(val_loader, desc="Evaluating heads"):
+                input_ids = batch["input_ids"].to(device)
+                attention_mask = batch["attention_mask"].to(device)
+                labels = batch["labels"].to(device)
+                states = layer_cls_states(model, input_ids, attention_mask, exit_layers)
+                for layer in exit_layers:
+                    preds = torch.argmax(heads(layer, states[layer]), dim=1)
+                    correct[layer] += (preds == labels).sum().item()
+                total += labels.size(0)
+        
+        print(f"Train Loss: {total_loss / len(train_loader):.4f}")
+        for layer in exit_layers:
+            print(f"Val Accuracy (exit after layer {layer}): {correct[layer] / total:.4f}")
+    
+    heads_path = os.path.join(model_dir, EARLY_EXIT_HEADS_FILENAME)
+    heads.cpu().save(heads_path)
+    print(f"\nEarly-exit heads saved to: {heads_path}")
+    print("Tune the threshold with: python evaluate_model.py --early-exit-thresholds 0.5 0.7 0.9")
+
 if __name__ == "__main__":
-    train()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the DistilBERT emotion classifier")
+    parser.add_argument(
+        "--early-exit-heads",
+        action="store_true",
+        help="Train early-exit heads on top of the existing best_model instead of fine-tuning"
+    )
+    args = parser.parse_args()
+    
+    if args.early_exit_heads:
+        train_early_exit_heads()
+    else:
+        train()
 
@@ -18,11 +18,10 @@ import {
   AlertDialogTrigger,
 } from '@/components/ui/alert-dialog';
 import { analyzeSentiment, getEmotionEmoji } from '@/utils/sentimentAnalysis';
-import { analyzeEmotionWithML } from '@/utils/mlEmotionApi';
 import { getEmpatheticResponse, getSuggestedActivities, getEmpatheticResponse28 } from '@/utils/responseEngine';
-import { saveMoodEntry, getMoodEntries } from '@/utils/moodStorage';
+import { saveMoodEntry, getMoodEntries, getMoodUserId } from '@/utils/moodStorage';
 import { getEmotionEmoji as getGoEmotionEmoji, getEmotionColor, mapGoEmotionToAppEmotion } from '@/utils/emotions';
-import { getEmotionResponse, EmotionResponseData } from '@/utils/emotionResponseApi';
+import { getEmotionResponse, analyzeText, EmotionResponseData } from '@/utils/emotionResponseApi';
 import { loadChatMessages, saveChatMessages, clearChatMessages, addChatMessage, ChatMessage as ChatMessageType } from '@/utils/chatStorage';
 import { ThemeSuggestionModal } from '@/components/ThemeSuggestionModal';
 import { mapEmotionToTheme, EmotionTheme } from '@/utils/themeManager';
@@ -121,10 +120,12 @@ const Chat = () => {
     setIsAnalyzing(true);
 
     try {
-      // Try to use ML model first - get raw emotion (all 28 emotions)
-      const mlResult = await analyzeEmotionWithML(input, true);
-      const rawEmotion = mlResult.rawEmotion;
-      const confidence = mlResult.confidence;
+      // Try to use ML model first - one request returns the raw emotion
+      // (all 28 emotions) and the comprehensive emotion response; the server
+      // records the entry in its mood store, so no history is uploaded
+      const analysis = await analyzeText(input, { userId: getMoodUserId() });
+      const rawEmotion = analysis.top_emotion;
+      const confidence = analysis.top_confidence;
       
       // Map to app emotion for activities/response system
       const appEmotion = mapGoEmotionToAppEmotion(rawEmotion);
@@ -151,34 +152,19 @@ const Chat = () => {
         }
       }
 
-      // Try to get comprehensive emotion response
-      try {
-        const moodHistory = getMoodEntries().slice(-7).map(entry => ({
-          emotion: entry.emotion,
-          timestamp: entry.timestamp,
-          confidence: entry.confidence,
-        }));
-
-        const emotionResponse = await getEmotionResponse({
-          emotion: rawEmotion,
-          text_input: input,
-          intensity: confidence,
-          mood_history: moodHistory,
-        });
-
+      if (analysis.emotion_response) {
         // Add response message with comprehensive data
         const aiMessage: ChatMessageType = {
           id: (Date.now() + 1).toString(),
-          content: emotionResponse.supportive_message,
+          content: analysis.emotion_response.supportive_message,
           isUser: false,
           emotion: emotionDisplay,
-          emotionResponse: emotionResponse,
+          emotionResponse: analysis.emotion_response,
         };
         setMessages(prev => addChatMessage(prev, aiMessage));
-        setIsAnalyzing(false);
-      } catch (responseError) {
-        // Fallback to simple response if comprehensive API fails
-        console.warn('Comprehensive response API unavailable, using fallback:', responseError);
+      } else {
+        // Fallback to simple response if support services are unavailable
+        console.warn('Comprehensive response unavailable, using fallback');
         const response = getEmpatheticResponse28(rawEmotion as any, input);
         const aiMessage: ChatMessageType = {
           id: (Date.now() + 1).toString(),
@@ -187,8 +173,8 @@ const Chat = () => {
           emotion: emotionDisplay,
         };
         setMessages(prev => addChatMessage(prev, aiMessage));
-        setIsAnalyzing(false);
       }
+      setIsAnalyzing(false);
     } catch (error) {
       // Fallback to keyword-based analysis if ML API fails
       console.warn('ML API unavailable, using fallback analysis:', error);
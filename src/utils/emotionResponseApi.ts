@@ -51,9 +51,9 @@ export interface EmotionResponseData {
       neu: number;
       neg: number;
     };
-    textblob_polarity: number;
-    textblob_subjectivity: number;
-    tones: string[];
+    textblob_polarity: number | null;
+    textblob_subjectivity: number | null;
+    tones: string[] | null;
     overall_sentiment: string;
     intensity: number;
   };
@@ -68,6 +68,10 @@ export interface EmotionResponseRequest {
     timestamp: number;
     confidence?: number;
   }>;
+  // Use this user's server-side mood store instead of mood_history
+  user_id?: string;
+  // Only these fields are computed and returned (default: all)
+  fields?: string[];
 }
 
 /**
@@ -97,3 +101,156 @@ export async function getEmotionResponse(
   }
 }
 
+
+/**
+ * Get emotion responses for many entries in a single request
+ * (e.g. support content for past mood entries); results are in input order
+ */
+export async function getEmotionResponseBatch(
+  requests: EmotionResponseRequest[]
+): Promise<EmotionResponseData[]> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/emotion-response/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ items: requests }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`API request failed: ${response.statusText}`);
+    }
+
+    const data: { responses: EmotionResponseData[] } = await response.json();
+    return data.responses;
+  } catch (error) {
+    console.error('Error calling emotion-response batch API:', error);
+    throw error;
+  }
+}
+
+export interface AnalyzeResponseData {
+  predictions: Array<{
+    emotion: string;
+    confidence: number;
+  }>;
+  top_emotion: string;
+  top_confidence: number;
+  stage?: string | null;
+  emotion_response: EmotionResponseData | null;
+}
+
+export interface AnalyzeOptions {
+  // Server-side mood store key; the message is recorded there and the
+  // stored history personalizes the response (no history upload needed)
+  userId?: string;
+  // Previous entries only (when no userId); the server appends this message
+  moodHistory?: EmotionResponseRequest['mood_history'];
+  topK?: number;
+  fields?: string[];
+}
+
+/**
+ * Classify text and get the emotion response in a single request
+ * (replaces predictEmotion followed by getEmotionResponse)
+ */
+export async function analyzeText(
+  text: string,
+  options: AnalyzeOptions = {}
+): Promise<AnalyzeResponseData> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/analyze`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        text,
+        top_k: options.topK ?? 3,
+        user_id: options.userId,
+        mood_history: options.moodHistory,
+        fields: options.fields,
+      }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`API request failed: ${response.statusText}`);
+    }
+
+    const data: AnalyzeResponseData = await response.json();
+    return data;
+  } catch (error) {
+    console.error('Error calling analyze API:', error);
+    throw error;
+  }
+}
+
+export interface MoodAnalyticsData {
+  entries: number;
+  excluded_entries: number;
+  first_timestamp: number | null;
+  last_timestamp: number | null;
+  frequencies: Record<string, { count: number; share: number }>;
+  mood_score: { mean: number | null; recent_mean: number | null };
+  daily: {
+    dates: string[];
+    counts: number[];
+    mean_score: Array<number | null>;
+    rolling_mean: Array<number | null>;
+  };
+  streaks: {
+    current: { emotion: string; length: number } | null;
+    longest: Record<string, number>;
+    current_negative: number;
+    longest_negative: number;
+  };
+  day_of_week: Array<{
+    day: string;
+    count: number;
+    mean_score: number | null;
+    dominant_emotion: string | null;
+  }>;
+  change_points: Array<{
+    date: string;
+    before: number;
+    after: number;
+    shift: number;
+  }>;
+}
+
+/**
+ * Mood trends computed server-side, from the stored history of a user
+ * (userId) or from local entries (timestamps in milliseconds, as stored)
+ */
+export async function getMoodAnalytics(
+  source: { userId: string } | { entries: Array<{ emotion: string; timestamp: number }> },
+  window: number = 7
+): Promise<MoodAnalyticsData> {
+  try {
+    const body = 'userId' in source
+      ? { user_id: source.userId }
+      : { entries: source.entries.map(entry => ({ emotion: entry.emotion, timestamp: entry.timestamp / 1000 })) };
+
+    const response = await fetch(`${API_BASE_URL}/mood/analytics`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        ...body,
+        window,
+        tz_offset_minutes: -new Date().getTimezoneOffset(),
+      }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`API request failed: ${response.statusText}`);
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error('Error calling mood analytics API:', error);
+    throw error;
+  }
+}
@@ -9,6 +9,21 @@ export interface MoodEntry {
 }
 
 const STORAGE_KEY = 'mindease_mood_logs';
+const USER_ID_KEY = 'mindease_mood_user_id';
+
+/**
+ * Anonymous id for this browser, used to key the server-side mood store
+ */
+export const getMoodUserId = (): string => {
+  let userId = localStorage.getItem(USER_ID_KEY);
+  if (!userId) {
+    userId = typeof crypto !== 'undefined' && 'randomUUID' in crypto
+      ? crypto.randomUUID()
+      : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    localStorage.setItem(USER_ID_KEY, userId);
+  }
+  return userId;
+};
 
 export const saveMoodEntry = (emotion: Emotion, message: string, confidence: number): MoodEntry => {
   const entry: MoodEntry = {